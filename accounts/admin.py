@@ -11,6 +11,7 @@ class UserAdmin(admin.ModelAdmin):
         "first_name",
         "is_staff",
         "is_approver",
+        "email_digest",
         "is_active",
     )
     search_fields = ("email", "last_name", "first_name")
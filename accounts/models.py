@@ -73,6 +73,9 @@ class User(AbstractBaseUser, PermissionsMixin, BaseModel):
     date_joined = models.DateTimeField(
         default=timezone.now, verbose_name="登録日時"
     )
+    email_digest = models.BooleanField(
+        default=False, verbose_name="通知メールのまとめ送信"
+    )
 
     objects: UserManager = UserManager()
 
@@ -3,11 +3,16 @@ from django.contrib import admin
 from .models import (
     ApprovalLog,
     Approver,
+    DigestEntry,
+    OutboundEmail,
+    ReminderLedger,
+    RequestNumberSequence,
 )
 from .models.types import (
     LocalBusinessTripRequest,
     SimpleRequest,
 )
+from .routes import sync_routes
 
 
 class ApproverInline(admin.TabularInline):
@@ -16,6 +21,17 @@ class ApproverInline(admin.TabularInline):
     ordering = ("order",)
 
 
+class ApprovalRouteAdminMixin:
+    """
+    承認ルート (ApproverInline) の編集後に、承認ルートから導出するデータ
+    （関係者・現在の承認者）を同期する。
+    """
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        sync_routes([form.instance.pk])
+
+
 class ApprovalLogInline(admin.TabularInline):
     model = ApprovalLog
     extra = 0
@@ -33,7 +49,7 @@ class ApprovalLogInline(admin.TabularInline):
 
 
 @admin.register(SimpleRequest)
-class SimpleRequestAdmin(admin.ModelAdmin):
+class SimpleRequestAdmin(ApprovalRouteAdminMixin, admin.ModelAdmin):
     list_display = (
         "request_number",
         "title",
@@ -52,14 +68,19 @@ class SimpleRequestAdmin(admin.ModelAdmin):
         "applicant__email",
     )
     inlines = [ApproverInline, ApprovalLogInline]
-    readonly_fields = ("request_number", "created_at", "updated_at")
+    readonly_fields = (
+        "request_number",
+        "current_approver",
+        "created_at",
+        "updated_at",
+    )
 
     def get_queryset(self, request):
         return super().get_queryset(request).select_related("applicant")
 
 
 @admin.register(LocalBusinessTripRequest)
-class LocalBusinessTripRequestAdmin(admin.ModelAdmin):
+class LocalBusinessTripRequestAdmin(ApprovalRouteAdminMixin, admin.ModelAdmin):
     list_display = (
         "request_number",
         "title",
@@ -80,7 +101,12 @@ class LocalBusinessTripRequestAdmin(admin.ModelAdmin):
         "applicant__email",
     )
     inlines = [ApproverInline, ApprovalLogInline]
-    readonly_fields = ("request_number", "created_at", "updated_at")
+    readonly_fields = (
+        "request_number",
+        "current_approver",
+        "created_at",
+        "updated_at",
+    )
 
     def get_queryset(self, request):
         return super().get_queryset(request).select_related("applicant")
@@ -107,6 +133,20 @@ class ApproverAdmin(admin.ModelAdmin):
     def request_display(self, obj):
         return obj.request.request_number
 
+    # 承認者の編集後に、承認ルートから導出するデータを同期する
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        sync_routes([obj.request_id])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        sync_routes([obj.request_id])
+
+    def delete_queryset(self, request, queryset):
+        request_ids = set(queryset.values_list("request_id", flat=True))
+        super().delete_queryset(request, queryset)
+        sync_routes(request_ids)
+
 
 @admin.register(ApprovalLog)
 class ApprovalLogAdmin(admin.ModelAdmin):
@@ -144,3 +184,42 @@ class ApprovalLogAdmin(admin.ModelAdmin):
 
     def has_change_permission(self, request, obj=None):
         return False
+
+
+@admin.register(RequestNumberSequence)
+class RequestNumberSequenceAdmin(admin.ModelAdmin):
+    list_display = ("prefix", "yyyymm", "last_number", "updated_at")
+    list_filter = ("prefix",)
+    ordering = ("-yyyymm", "prefix")
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = (
+        "subject",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "sent_at",
+        "created_at",
+    )
+    list_filter = ("status", "created_at")
+    search_fields = ("subject", "last_error")
+    readonly_fields = ("created_at", "updated_at", "sent_at")
+
+
+@admin.register(ReminderLedger)
+class ReminderLedgerAdmin(admin.ModelAdmin):
+    list_display = ("request", "user", "last_reminded_at")
+    list_select_related = ("request", "user")
+    search_fields = ("request__request_number", "user__email")
+    readonly_fields = ("created_at", "updated_at")
+
+
+@admin.register(DigestEntry)
+class DigestEntryAdmin(admin.ModelAdmin):
+    list_display = ("summary", "user", "event", "created_at")
+    list_filter = ("event",)
+    list_select_related = ("user",)
+    search_fields = ("summary", "user__email")
+    readonly_fields = ("created_at", "updated_at")
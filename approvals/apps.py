@@ -1,6 +1,30 @@
 from django.apps import AppConfig
+from django.core.signals import setting_changed
+from django.db.models.signals import post_migrate
+from django.utils.autoreload import file_changed
 
 
 class ApprovalsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "approvals"
+
+    def ready(self):
+        from .emails import clear_cache
+        from .registry import registry
+        from .routes import backfill_routes
+        from .search import setup_search_backend
+
+        # 申請タイプのレジストリを構築（スラッグ・プレフィックスの重複検証を含む）
+        registry.build()
+
+        # マイグレーション後に全文検索インデックスを作成する
+        post_migrate.connect(setup_search_backend, sender=self)
+        # 既存の申請の承認ルートから導出するデータを同期する
+        post_migrate.connect(backfill_routes, sender=self)
+
+        # 設定・テンプレートの変更時にメールテンプレートのキャッシュと
+        # 解決済みの詳細テンプレート・フォームクラスを破棄する
+        setting_changed.connect(clear_cache)
+        file_changed.connect(clear_cache)
+        setting_changed.connect(registry.clear_resolved)
+        file_changed.connect(registry.clear_resolved)
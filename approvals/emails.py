@@ -0,0 +1,156 @@
+"""
+通知メールの件名・本文の組み立て。
+
+templates/emails/*.txt はプロセスごとに1回だけ読み込み・コンパイルして保持し、
+件名の接頭辞 ([PROJECT_NAME]) も1回だけ組み立てて保持する。
+テストなどで設定が変更された場合や、開発サーバーでテンプレートが
+変更された場合はキャッシュを破棄する
+（ApprovalsConfig.ready で setting_changed / file_changed に接続）。
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, TypedDict
+
+from django.conf import settings
+from django.template import loader
+
+if TYPE_CHECKING:
+    from accounts.models import User
+    from approvals.models import Request
+
+
+class RequestEmailContext(TypedDict):
+    """承認依頼・再申請・承認完了・取り下げ"""
+
+    request_obj: Request
+    link: str
+
+
+class ActionEmailContext(TypedDict):
+    """差戻し・却下・代理差戻し"""
+
+    request_obj: Request
+    actor: User
+    comment: str
+    link: str
+
+
+class ReminderEmailContext(TypedDict):
+    """承認待ちリマインダー"""
+
+    approver_name: str
+    request_list: list[dict[str, Any]]
+
+
+class DigestEmailContext(TypedDict):
+    """通知のまとめ"""
+
+    recipient_name: str
+    entries: list[Any]
+
+
+# イベント: (テンプレート, 件名の書式)
+# 件名の書式には申請の件名 (title) を埋め込める
+EMAIL_EVENTS: dict[str, tuple[str, str]] = {
+    "approval_request": ("emails/approval_request.txt", "承認依頼: {title}"),
+    "resubmitted": ("emails/resubmitted.txt", "再承認依頼: {title}"),
+    "approved": ("emails/approved.txt", "承認完了: {title}"),
+    "remanded": ("emails/remanded.txt", "差戻し: {title}"),
+    "rejected": ("emails/rejected.txt", "却下: {title}"),
+    "withdrawn": ("emails/withdrawn.txt", "取り下げ: {title}"),
+    "proxy_remanded": ("emails/proxy_remanded.txt", "代理差戻し: {title}"),
+    "approval_reminder": (
+        "emails/approval_reminder.txt",
+        "Reminder: Pending approval requests",
+    ),
+    "digest": ("emails/digest.txt", "通知のまとめ"),
+}
+
+# まとめ送信 (User.email_digest) の対象にできるイベント
+DIGEST_EVENTS = {"approval_request", "resubmitted"}
+
+# 設定が変わったらキャッシュを破棄する設定名
+CACHE_SETTINGS = {"PROJECT_NAME", "TEMPLATES"}
+
+
+def request_context(request_obj: Request, link: str) -> RequestEmailContext:
+    return {"request_obj": request_obj, "link": link}
+
+
+def action_context(
+    request_obj: Request, actor: User, comment: str, link: str
+) -> ActionEmailContext:
+    return {
+        "request_obj": request_obj,
+        "actor": actor,
+        "comment": comment,
+        "link": link,
+    }
+
+
+def reminder_context(
+    approver: User, request_list: list[dict[str, Any]]
+) -> ReminderEmailContext:
+    return {
+        "approver_name": approver.get_display_name(),
+        "request_list": request_list,
+    }
+
+
+def digest_context(recipient: User, entries: list[Any]) -> DigestEmailContext:
+    return {
+        "recipient_name": recipient.get_display_name(),
+        "entries": entries,
+    }
+
+
+@lru_cache(maxsize=None)
+def get_template(template_name: str):
+    """コンパイル済みのテンプレートを返す（プロセス内でキャッシュ）"""
+    return loader.get_template(template_name)
+
+
+@lru_cache(maxsize=None)
+def get_subject_prefix() -> str:
+    """
+    件名の接頭辞 ([PROJECT_NAME]) を返す（プロセス内でキャッシュ）。
+    プロジェクト名に { } が含まれていてもよいよう、書式には含めない。
+    """
+    return f"[{settings.PROJECT_NAME}] "
+
+
+def _title(context: dict[str, Any]) -> str:
+    request_obj = context.get("request_obj")
+    return request_obj.title if request_obj is not None else ""
+
+
+def render_subject(event: str, context: dict[str, Any]) -> str:
+    return get_subject_prefix() + render_summary(event, context)
+
+
+def render_summary(event: str, context: dict[str, Any]) -> str:
+    """接頭辞のない件名（まとめメールの1行分）"""
+    return EMAIL_EVENTS[event][1].format(title=_title(context))
+
+
+def render_body(event: str, context: dict[str, Any]) -> str:
+    return get_template(EMAIL_EVENTS[event][0]).render(context)
+
+
+def render_email(event: str, context: dict[str, Any]) -> tuple[str, str]:
+    """イベントのメールの (件名, 本文) を返す"""
+    return render_subject(event, context), render_body(event, context)
+
+
+def clear_cache(**kwargs) -> None:
+    """
+    テンプレートと件名のキャッシュを破棄する
+    （setting_changed / file_changed のハンドラ）。
+    """
+    setting = kwargs.get("setting")
+    if setting is not None and setting not in CACHE_SETTINGS:
+        return
+    get_template.cache_clear()
+    get_subject_prefix.cache_clear()
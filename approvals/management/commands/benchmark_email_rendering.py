@@ -0,0 +1,144 @@
+import json
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+
+from approvals import emails
+from approvals.models.types import SimpleRequest
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark notification email rendering. "
+        "Renders a burst of notifications (cycling through every email "
+        "event) with render_to_string per call and with the cached "
+        "renderer (approvals.emails), and reports the cost of each."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count",
+            type=int,
+            default=10000,
+            help="Number of notifications rendered per mode "
+            "(default: 10000).",
+        )
+        parser.add_argument(
+            "--json",
+            action="store_true",
+            help="Print the result as JSON (for trend tracking).",
+        )
+
+    def handle(self, *args, **options):
+        count = max(1, options["count"])
+        samples = self.build_samples()
+
+        # 1回目の読み込みは計測から除く
+        self.render_baseline(samples, len(samples))
+        self.render_cached(samples, len(samples))
+
+        results = {}
+        for name, render in (
+            ("render_to_string", self.render_baseline),
+            ("cached", self.render_cached),
+        ):
+            started = time.perf_counter()
+            render(samples, count)
+            elapsed = time.perf_counter() - started
+            results[name] = {
+                "elapsed_s": round(elapsed, 4),
+                "per_email_us": round(elapsed / count * 1_000_000, 2),
+            }
+
+        baseline = results["render_to_string"]["elapsed_s"]
+        cached = results["cached"]["elapsed_s"]
+        report = {
+            "count": count,
+            "events": len(samples),
+            "modes": results,
+            "speedup": round(baseline / cached, 2) if cached else 0.0,
+        }
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"Rendered {count} notifications "
+            f"({len(samples)} event types) per mode"
+        )
+        self.stdout.write(f"{'mode':<18}{'total(s)':>10}{'per email(us)':>16}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<18}{result['elapsed_s']:>10}"
+                f"{result['per_email_us']:>16}"
+            )
+        self.stdout.write(f"Speedup: {report['speedup']}x")
+
+    def build_samples(self):
+        """
+        イベントごとの (イベント, コンテキスト) を作る。
+        データベースには保存しない（描画のコストだけを計測する）。
+        """
+        applicant = User(
+            email="bench-applicant@example.invalid",
+            last_name="申請",
+            first_name="太郎",
+        )
+        actor = User(
+            email="bench-approver@example.invalid",
+            last_name="承認",
+            first_name="花子",
+        )
+        request_obj = SimpleRequest(
+            request_number="BENCH-000001",
+            title="ベンチマーク申請",
+            applicant=applicant,
+            current_step=1,
+            content="benchmark",
+        )
+        link = "http://localhost:8000/approvals/detail/"
+        samples = []
+        for event in emails.EMAIL_EVENTS:
+            if event == "approval_reminder":
+                request_list = [{"request_obj": request_obj, "url": link}] * 3
+                context = emails.reminder_context(actor, request_list)
+            elif event == "digest":
+                context = emails.digest_context(actor, [])
+            elif event in ("remanded", "rejected", "proxy_remanded"):
+                context = emails.action_context(
+                    request_obj, actor, "コメント", link
+                )
+            else:
+                context = emails.request_context(request_obj, link)
+            samples.append((event, context))
+        return samples
+
+    def render_baseline(self, samples, count):
+        """従来の方法: 通知ごとに render_to_string と件名の組み立てを行う"""
+        rendered = 0
+        for i in range(count):
+            event, context = samples[i % len(samples)]
+            template_name, subject_format = emails.EMAIL_EVENTS[event]
+            request_obj = context.get("request_obj")
+            title = request_obj.title if request_obj is not None else ""
+            subject = f"[{settings.PROJECT_NAME}] " + subject_format.format(
+                title=title
+            )
+            body = render_to_string(template_name, context)
+            rendered += len(subject) + len(body)
+        return rendered
+
+    def render_cached(self, samples, count):
+        """approvals.emails のキャッシュ済みテンプレートで描画する"""
+        rendered = 0
+        for i in range(count):
+            event, context = samples[i % len(samples)]
+            subject, body = emails.render_email(event, context)
+            rendered += len(subject) + len(body)
+        return rendered
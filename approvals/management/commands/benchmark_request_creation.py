@@ -0,0 +1,337 @@
+import json
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from approvals.models import Request
+
+User = get_user_model()
+
+
+class ErrorCollector(logging.Handler):
+    """
+    approvals.views が出力するエラーログを分類して数える。
+    ビューは例外を握りつぶしてフォームを再表示するため、
+    ログから採番衝突やロック待ちタイムアウトを検出する。
+    """
+
+    LOCK_KEYWORDS = ("locked", "deadlock", "lock wait", "could not obtain")
+    DUPLICATE_KEYWORDS = ("request_number", "duplicate", "unique")
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        message = record.getMessage().lower()
+        if any(k in message for k in self.LOCK_KEYWORDS):
+            kind = "lock_waits"
+        elif any(k in message for k in self.DUPLICATE_KEYWORDS):
+            kind = "duplicate_numbers"
+        else:
+            kind = "other_errors"
+        with self._lock:
+            self.counts[kind] += 1
+
+
+def percentile(values, pct):
+    """
+    最近傍順位法によるパーセンタイル (values はソート済み)。
+    """
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark concurrent request submission. "
+        "N worker threads each run create -> approve -> approve flows "
+        "against the configured (local) database and report throughput, "
+        "latency percentiles, lock waits and duplicate-number errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of concurrent worker threads (default: 4).",
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=10,
+            help="Number of flows per worker (default: 10).",
+        )
+        parser.add_argument(
+            "--request-type",
+            default="simple",
+            help="Slug of the request type to submit (default: simple).",
+        )
+        parser.add_argument(
+            "--json",
+            action="store_true",
+            help="Print the result as JSON (for trend tracking).",
+        )
+        parser.add_argument(
+            "--keep-data",
+            action="store_true",
+            help="Do not delete the benchmark users and requests.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Allow running while DEBUG is False.",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["force"]:
+            raise CommandError(
+                "This command writes benchmark data to the database. "
+                "Run it against a local database (DEBUG=True) "
+                "or pass --force."
+            )
+
+        model_class = Request.get_by_slug(options["request_type"])
+        if not model_class:
+            raise CommandError(
+                f"Unknown request type: {options['request_type']}"
+            )
+
+        workers = max(1, options["workers"])
+        iterations = max(1, options["iterations"])
+        run_id = uuid.uuid4().hex[:8]
+
+        applicants, approvers = self.create_users(run_id, workers)
+        collector = ErrorCollector()
+        view_logger = logging.getLogger("approvals.views")
+        view_logger.addHandler(collector)
+
+        # 計測対象はビューの処理時間なので、メールはメモリ上に送る
+        test_settings = override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+        )
+        timings = defaultdict(list)
+        results = defaultdict(int)
+        lock = threading.Lock()
+
+        def worker(index):
+            try:
+                samples, outcome = self.run_worker(
+                    run_id,
+                    index,
+                    iterations,
+                    model_class,
+                    applicants[index],
+                    approvers,
+                )
+                with lock:
+                    for name, values in samples.items():
+                        timings[name].extend(values)
+                    for name, value in outcome.items():
+                        results[name] += value
+            finally:
+                connections.close_all()
+
+        try:
+            with test_settings:
+                threads = [
+                    threading.Thread(target=worker, args=(i,))
+                    for i in range(workers)
+                ]
+                started = time.perf_counter()
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                elapsed = time.perf_counter() - started
+        finally:
+            view_logger.removeHandler(collector)
+
+        report = self.build_report(
+            workers, iterations, elapsed, timings, results, collector
+        )
+
+        if not options["keep_data"]:
+            self.cleanup(applicants + approvers)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_report(report)
+
+    def create_users(self, run_id, workers):
+        """ベンチマーク用の申請者（ワーカーごと）と承認者2名を作成する"""
+        applicants = [
+            User.objects.create_user(
+                email=f"bench-{run_id}-applicant{i}@example.invalid",
+                is_active=True,
+            )
+            for i in range(workers)
+        ]
+        approvers = [
+            User.objects.create_user(
+                email=f"bench-{run_id}-approver{i}@example.invalid",
+                is_active=True,
+                is_approver=True,
+            )
+            for i in range(1, 3)
+        ]
+        return applicants, approvers
+
+    def build_form_data(self, model_class, title, approvers):
+        """申請作成画面へのPOSTデータを組み立てる"""
+        data = {"title": title}
+        for field in model_class._meta.fields:
+            if field.model is Request or not field.editable:
+                continue
+            if field.choices:
+                data[field.name] = str(field.choices[0][0])
+            elif field.get_internal_type() == "DateField":
+                data[field.name] = "2026-01-01"
+            elif not field.blank:
+                data[field.name] = "benchmark"
+
+        data["approvers-TOTAL_FORMS"] = str(len(approvers))
+        data["approvers-INITIAL_FORMS"] = "0"
+        for i, approver in enumerate(approvers):
+            data[f"approvers-{i}-user"] = str(approver.pk)
+            data[f"approvers-{i}-order"] = str(i + 1)
+        return data
+
+    def run_worker(
+        self, run_id, index, iterations, model_class, applicant, approvers
+    ):
+        """1ワーカー分のフローを実行し、計測値と結果を返す"""
+        samples = defaultdict(list)
+        outcome = defaultdict(int)
+
+        applicant_client = Client()
+        applicant_client.force_login(applicant)
+        approver_clients = []
+        for approver in approvers:
+            client = Client()
+            client.force_login(approver)
+            approver_clients.append(client)
+
+        create_url = reverse(
+            "approvals:create",
+            kwargs={"request_type": model_class.get_slug()},
+        )
+
+        for i in range(iterations):
+            title = f"bench {run_id} w{index} #{i}"
+            data = self.build_form_data(model_class, title, approvers)
+            flow_started = time.perf_counter()
+
+            started = time.perf_counter()
+            response = applicant_client.post(create_url, data)
+            samples["create"].append(time.perf_counter() - started)
+
+            if response.status_code != 302:
+                outcome["failed_creates"] += 1
+                continue
+
+            req = Request.objects.filter(title=title).first()
+            if req is None:
+                outcome["failed_creates"] += 1
+                continue
+
+            action_url = reverse("approvals:action", kwargs={"pk": req.pk})
+            for client in approver_clients:
+                started = time.perf_counter()
+                client.post(action_url, {"action": "approve"})
+                samples["approve"].append(time.perf_counter() - started)
+
+            samples["flow"].append(time.perf_counter() - flow_started)
+
+            req.refresh_from_db(fields=["status"])
+            if req.status == Request.STATUS_APPROVED:
+                outcome["completed_flows"] += 1
+            else:
+                outcome["failed_approvals"] += 1
+
+        for client in [applicant_client, *approver_clients]:
+            client.logout()
+
+        return samples, outcome
+
+    def build_report(
+        self, workers, iterations, elapsed, timings, results, collector
+    ):
+        operations = {}
+        for name in ("create", "approve", "flow"):
+            values = sorted(timings.get(name, []))
+            operations[name] = {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "max_ms": round((values[-1] if values else 0) * 1000, 2),
+            }
+
+        completed = results.get("completed_flows", 0)
+        return {
+            "workers": workers,
+            "iterations": iterations,
+            "expected_flows": workers * iterations,
+            "completed_flows": completed,
+            "failed_creates": results.get("failed_creates", 0),
+            "failed_approvals": results.get("failed_approvals", 0),
+            "elapsed_s": round(elapsed, 3),
+            "throughput_flows_per_s": (
+                round(completed / elapsed, 2) if elapsed else 0.0
+            ),
+            "operations": operations,
+            "lock_waits": collector.counts["lock_waits"],
+            "duplicate_numbers": collector.counts["duplicate_numbers"],
+            "other_errors": collector.counts["other_errors"],
+            "database": connections["default"].vendor,
+        }
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"Database: {report['database']}, "
+            f"workers: {report['workers']}, "
+            f"iterations/worker: {report['iterations']}"
+        )
+        self.stdout.write(
+            f"Completed flows: {report['completed_flows']}"
+            f"/{report['expected_flows']} in {report['elapsed_s']}s "
+            f"({report['throughput_flows_per_s']} flows/s)"
+        )
+        self.stdout.write(
+            f"{'operation':<10}{'count':>8}{'p50(ms)':>10}"
+            f"{'p95(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}"
+        )
+        for name, op in report["operations"].items():
+            self.stdout.write(
+                f"{name:<10}{op['count']:>8}{op['p50_ms']:>10}"
+                f"{op['p95_ms']:>10}{op['p99_ms']:>10}{op['max_ms']:>10}"
+            )
+        self.stdout.write(f"Failed creates: {report['failed_creates']}")
+        self.stdout.write(f"Failed approvals: {report['failed_approvals']}")
+        self.stdout.write(f"Lock waits/timeouts: {report['lock_waits']}")
+        self.stdout.write(
+            f"Duplicate-number errors: {report['duplicate_numbers']}"
+        )
+        self.stdout.write(f"Other errors: {report['other_errors']}")
+
+    def cleanup(self, users):
+        """ベンチマークで作成したデータを削除する"""
+        Request.objects.filter(applicant__in=users).delete()
+        User.objects.filter(pk__in=[u.pk for u in users]).delete()
@@ -0,0 +1,130 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from approvals.forms import create_request_form_class
+from approvals.registry import RequestTypeRegistry, registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark request form handling. "
+        "Simulates the form work of the create (GET) and update (POST) "
+        "views for every request type, generating the form class per "
+        "request and with the memoized form class, and reports the "
+        "cost per request of each."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count",
+            type=int,
+            default=2000,
+            help="Number of requests simulated per path and mode "
+            "(default: 2000).",
+        )
+        parser.add_argument(
+            "--json",
+            action="store_true",
+            help="Print the result as JSON (for trend tracking).",
+        )
+
+    def handle(self, *args, **options):
+        count = max(1, options["count"])
+        samples = self.build_samples()
+
+        paths = {"create": self.create_form, "update": self.update_form}
+        # レジストリと同じ方法で解決する（キャッシュは計測用の別インスタンス）
+        modes = {
+            "factory": create_request_form_class,
+            "cached": RequestTypeRegistry().get_form_class,
+        }
+
+        # 1回目の生成は計測から除く
+        for form_view in paths.values():
+            for get_form_class in modes.values():
+                self.run(form_view, get_form_class, samples, len(samples))
+
+        results = {}
+        for path, form_view in paths.items():
+            results[path] = {}
+            for mode, get_form_class in modes.items():
+                started = time.perf_counter()
+                self.run(form_view, get_form_class, samples, count)
+                elapsed = time.perf_counter() - started
+                results[path][mode] = {
+                    "elapsed_s": round(elapsed, 4),
+                    "per_request_us": round(elapsed / count * 1_000_000, 2),
+                }
+            factory = results[path]["factory"]["elapsed_s"]
+            cached = results[path]["cached"]["elapsed_s"]
+            results[path]["speedup"] = (
+                round(factory / cached, 2) if cached else 0.0
+            )
+            results[path]["saving_per_request_us"] = round(
+                results[path]["factory"]["per_request_us"]
+                - results[path]["cached"]["per_request_us"],
+                2,
+            )
+
+        report = {
+            "count": count,
+            "request_types": len(samples),
+            "paths": results,
+        }
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"Simulated {count} requests per path and mode "
+            f"({len(samples)} request types)"
+        )
+        self.stdout.write(
+            f"{'path':<8}{'mode':<10}{'total(s)':>10}{'per request(us)':>18}"
+        )
+        for path, result in results.items():
+            for mode in modes:
+                self.stdout.write(
+                    f"{path:<8}{mode:<10}{result[mode]['elapsed_s']:>10}"
+                    f"{result[mode]['per_request_us']:>18}"
+                )
+            self.stdout.write(
+                f"{path:<8}saving {result['saving_per_request_us']}us "
+                f"per request ({result['speedup']}x)"
+            )
+
+    def build_samples(self):
+        """
+        申請タイプごとの (モデルクラス, 再申請の入力データ) を作る。
+        データベースには保存しない（フォームの処理のコストだけを計測する）。
+        """
+        samples = []
+        for model_class in registry.types:
+            form = create_request_form_class(model_class)()
+            data = {
+                name: "" if field.initial is None else field.initial
+                for name, field in form.fields.items()
+            }
+            data["title"] = "ベンチマーク申請"
+            samples.append((model_class, data))
+        return samples
+
+    def run(self, form_view, get_form_class, samples, count):
+        for i in range(count):
+            model_class, data = samples[i % len(samples)]
+            form_view(get_form_class(model_class), model_class, data)
+
+    def create_form(self, form_class, model_class, data):
+        """新規申請画面の表示 (GET): 未入力のフォームを作る"""
+        return form_class()
+
+    def update_form(self, form_class, model_class, data):
+        """
+        再申請 (POST): 入力データでフォームを作り検証する。
+        必須項目が未入力のエラーになってもよい（計測対象は処理のコスト）。
+        """
+        form = form_class(data=data, instance=model_class())
+        return form.is_valid()
@@ -0,0 +1,109 @@
+import time
+from datetime import timedelta
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from approvals.models import DigestEntry
+from approvals.services import NotificationService
+
+# 送信中のまま残った通知（プロセスの停止など）を再送の対象とするまでの時間
+CLAIM_TIMEOUT = timedelta(minutes=30)
+
+
+class Command(BaseCommand):
+    help = (
+        "Send accumulated notifications to users who chose digest mode "
+        "(User.email_digest) as one summarized email per user. "
+        "Run it every N minutes (e.g. from cron) or with --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep flushing every --interval minutes.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=15.0,
+            help="Minutes between flushes with --loop (default: 15).",
+        )
+
+    def handle(self, *args, **options):
+        total_digests = total_entries = 0
+        try:
+            while True:
+                digests, entries = self.flush()
+                total_digests += digests
+                total_entries += entries
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"] * 60)
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted.")
+
+        self.stdout.write(
+            f"Sent {total_digests} digests "
+            f"covering {total_entries} notifications."
+        )
+
+    def flush(self):
+        """
+        溜まっている通知をユーザーごとに1通のメールにまとめて送信し、
+        (送信したメール数, まとめた通知数) を返す。
+        対象の通知はトランザクション内で短時間ロックして claimed_at を設定し
+        （複数のプロセスが動いていても同じ通知を二重に送らない）、
+        メールの送信はトランザクションの外で行う。
+        送信（またはアウトボックスへの登録）できたユーザーの通知だけを削除し、
+        失敗したユーザーの通知は次回の実行で再送する。
+        送信中にプロセスが停止した場合も CLAIM_TIMEOUT 後に再送の対象となる。
+        """
+        now = timezone.now()
+        skip_locked = connection.features.has_select_for_update_skip_locked
+        with transaction.atomic():
+            pks = list(
+                DigestEntry.objects.select_for_update(
+                    skip_locked=skip_locked, of=("self",)
+                )
+                .filter(
+                    Q(claimed_at__isnull=True)
+                    | Q(claimed_at__lt=now - CLAIM_TIMEOUT)
+                )
+                .values_list("pk", flat=True)
+            )
+            if not pks:
+                return 0, 0
+            DigestEntry.objects.filter(pk__in=pks).update(claimed_at=now)
+
+        entries = (
+            DigestEntry.objects.filter(pk__in=pks)
+            .select_related("user", "request")
+            .order_by("user_id", "created_at")
+        )
+        digests = flushed = failed = 0
+        for _, group in groupby(entries, key=lambda e: e.user_id):
+            group = list(group)
+            group_pks = [entry.pk for entry in group]
+            try:
+                NotificationService.send_digest(group[0].user, group)
+            except Exception:
+                # 通知は残し、次回の実行で再送する
+                DigestEntry.objects.filter(pk__in=group_pks).update(
+                    claimed_at=None
+                )
+                failed += len(group)
+                continue
+            DigestEntry.objects.filter(pk__in=group_pks).delete()
+            digests += 1
+            flushed += len(group)
+
+        self.stdout.write(
+            f"Flushed {flushed} notifications into {digests} digests"
+            f" ({failed} kept for retry)."
+        )
+        return digests, flushed
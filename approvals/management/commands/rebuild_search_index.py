@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from approvals.models import Request
+from approvals.search import setup_search_backend, update_document
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the full-text search documents of all requests. "
+        "Run once for existing data, or after changing the searchable "
+        "fields of a request type."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of requests loaded per query (default: 500).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+
+        # 全文検索インデックスが未作成なら作成する
+        setup_search_backend()
+
+        pks = list(Request.objects.order_by("pk").values_list("pk", flat=True))
+        for start in range(0, len(pks), batch_size):
+            end = start + batch_size
+            for req in Request.objects.filter(
+                pk__in=pks[start:end]
+            ).real_instances():
+                update_document(req)
+
+        self.stdout.write(f"Rebuilt search documents for {len(pks)} requests.")
@@ -1,20 +1,48 @@
 import logging
+import threading
+import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 
 from django.conf import settings
-from django.contrib.sites.models import Site
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection
 from django.core.management.base import BaseCommand
-from django.template.loader import render_to_string
+from django.db import connections
+from django.db.models import Exists, OuterRef
 from django.urls import reverse
 from django.utils import timezone
 
-from approvals.models import Approver, Request
+from approvals import emails
+from approvals.models import ReminderLedger, Request
+from core.sites import build_absolute_url
 
 logger = logging.getLogger(__name__)
 
 
+class RateLimiter:
+    """
+    送信レートの制限（全ワーカーで共有）。
+    rate (通/秒) を超えないよう、送信の間隔を 1/rate 秒以上あける。
+    rate が 0 以下の場合は制限しない。
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
 class Command(BaseCommand):
     help = (
         "Send reminder emails for requests that have been "
@@ -27,60 +55,115 @@ class Command(BaseCommand):
             action="store_true",
             help="Show what would be sent without actually sending emails.",
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of emails sent per connection (default: 100).",
+        )
+        parser.add_argument(
+            "--retries",
+            type=int,
+            default=2,
+            help="Times to retry failed emails of a batch (default: 2).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of threads rendering and sending batches "
+            "(default: 1).",
+        )
+        parser.add_argument(
+            "--rate-limit",
+            type=float,
+            default=0,
+            help="Maximum emails per second across all workers "
+            "(default: 0 = unlimited).",
+        )
+        parser.add_argument(
+            "--since-last-run",
+            action="store_true",
+            help="Skip requests already reminded to the current approver "
+            "since their last change and within --interval-hours.",
+        )
+        parser.add_argument(
+            "--interval-hours",
+            type=float,
+            default=24,
+            help="Hours before the same approver is reminded again "
+            "with --since-last-run (default: 24).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows fetched per database round trip (default: 2000).",
+        )
 
     def handle(self, *args, **options):
         dry_run = options["dry_run"]
+        self._output_lock = threading.Lock()
 
         # 1. 24時間前の日時を計算
-        time_threshold = timezone.now() - timedelta(hours=24)
+        now = timezone.now()
+        time_threshold = now - timedelta(hours=24)
 
         # 2. 対象となる申請を抽出
-        # updated_at が24時間以上前で、かつ status が PENDING のもの
-        stalled_requests = Request.objects.filter(
-            status=Request.STATUS_PENDING, updated_at__lte=time_threshold
-        ).select_related("applicant")
+        # updated_at が24時間以上前で、かつ status が PENDING のもの。
+        # 現在の承認者・申請者は同じクエリで結合して取得し、
+        # 件数によらず1クエリで（チャンクごとに読み込みながら）処理する
+        stalled_requests = (
+            Request.objects.filter(
+                status=Request.STATUS_PENDING, updated_at__lte=time_threshold
+            )
+            .select_related("applicant", "current_approver")
+            .order_by("submitted_at")
+        )
 
-        if not stalled_requests.exists():
-            self.stdout.write("No requests found for reminder.")
-            return
+        # --since-last-run: 最後の状態変化以降、かつ送信間隔内に
+        # 現在の承認者へ送信済みの申請は対象外にする
+        if options["since_last_run"]:
+            reminded_recently = ReminderLedger.objects.filter(
+                request=OuterRef("pk"),
+                user=OuterRef("current_approver"),
+                last_reminded_at__gte=OuterRef("updated_at"),
+                last_reminded_at__gt=now
+                - timedelta(hours=options["interval_hours"]),
+            )
+            stalled_requests = stalled_requests.filter(
+                ~Exists(reminded_recently)
+            )
 
         # 3. 承認者ごとにグルーピング
         # { user: [ {'request_obj': req, 'url': url}, ... ] }
         reminders = defaultdict(list)
 
-        # 現在のドメインを取得
-        # Siteフレームワークが設定されていない場合は例外を発生させる
-        current_site = Site.objects.get_current()
-        domain = current_site.domain
-        protocol = "https" if settings.SECURE_SSL_REDIRECT else "http"
-
-        count = 0
-        for req in stalled_requests:
-            # 現在のステップの承認者を取得
-            current_approver = (
-                req.approvers.filter(
-                    order=req.current_step, status=Approver.STATUS_PENDING
-                )
-                .select_related("user")
-                .first()
-            )
+        found = count = 0
+        for req in stalled_requests.iterator(chunk_size=options["chunk_size"]):
+            found += 1
+
+            # 現在のステップの承認者（申請と同時に取得済み）
+            user = req.current_approver
 
-            if not current_approver:
+            if not user:
                 logger.warning(
                     f"Request {req.request_number} has no pending approver "
                     f"at step {req.current_step}."
                 )
                 continue
 
-            user = current_approver.user
-
-            # URL生成
+            # URL生成（サイトのURLはプロセス内でキャッシュされる）
             path = reverse("approvals:detail", args=[req.pk])
-            full_url = f"{protocol}://{domain}{path}"
+            full_url = build_absolute_url(path)
 
             reminders[user].append({"request_obj": req, "url": full_url})
             count += 1
 
+        if not found:
+            self.stdout.write("No requests found for reminder.")
+            return
+
         self.stdout.write(
             f"Found {count} stalled requests. "
             f"Sending reminders to {len(reminders)} approvers."
@@ -90,45 +173,156 @@ class Command(BaseCommand):
             self.stdout.write("--- DRY RUN MODE ---")
 
         # 4. メール送信
-        subject = (
-            f"[{settings.PROJECT_NAME}] Reminder: Pending approval requests"
-        )
-        from_email = settings.DEFAULT_FROM_EMAIL
-
-        for user, request_list in reminders.items():
-            context = {
-                "approver_name": user.get_display_name(),
-                "request_list": request_list,
-            }
-            message = render_to_string("emails/approval_reminder.txt", context)
+        # 承認者のメールアドレス順に処理する（dry-run の出力を毎回同じにする）
+        jobs = sorted(reminders.items(), key=lambda item: item[0].email)
 
-            if dry_run:
+        if dry_run:
+            for user, request_list in jobs:
+                email = self.build_message(user, request_list)
                 self.stdout.write(f"Would send email to: {user.email}")
-                self.stdout.write(f"Subject: {subject}")
+                self.stdout.write(f"Subject: {email.subject}")
                 self.stdout.write("--- Message Body Start ---")
-                self.stdout.write(message)
+                self.stdout.write(email.body)
                 self.stdout.write("--- Message Body End ---")
-                continue
+            self.stdout.write("--- DRY RUN COMPLETED ---")
+            return
 
-            try:
-                send_mail(
-                    subject,
-                    message,
-                    from_email,
-                    [user.email],
-                    fail_silently=False,
+        delivered = self.send_in_batches(
+            jobs,
+            batch_size=max(1, options["batch_size"]),
+            retries=options["retries"],
+            workers=max(1, options["workers"]),
+            rate_limiter=RateLimiter(options["rate_limit"]),
+        )
+
+        # 5. 送信できた (申請, 承認者) を記録する
+        ReminderLedger.record(
+            (request_info["request_obj"].pk, user.pk)
+            for user, request_list in delivered
+            for request_info in request_list
+        )
+        self.stdout.write("Reminder process completed.")
+
+    def build_message(self, user, request_list):
+        """承認者1人分のリマインダーメールを組み立てる"""
+        subject, message = emails.render_email(
+            "approval_reminder", emails.reminder_context(user, request_list)
+        )
+        return EmailMessage(
+            subject, message, settings.DEFAULT_FROM_EMAIL, [user.email]
+        )
+
+    def send_in_batches(
+        self, jobs, batch_size, retries, workers, rate_limiter
+    ):
+        """
+        承認者を batch_size 人ずつのバッチに分け、バッチごとに
+        メッセージの組み立てと1本の接続での送信を行う。
+        workers が2以上の場合はバッチをスレッドプールで並列に処理する。
+        送信できた (承認者, 申請リスト) のリストを返す。
+        """
+        batches = []
+        for start in range(0, len(jobs), batch_size):
+            end = start + batch_size
+            batches.append(jobs[start:end])
+        batch_count = len(batches)
+        delivered = []
+        failed_total = 0
+        started_all = time.perf_counter()
+
+        def process(index, batch):
+            started = time.perf_counter()
+            outgoing = [(self.build_message(*job), job) for job in batch]
+            failed = self.send_batch(outgoing, rate_limiter)
+            for attempt in range(1, retries + 1):
+                if not failed:
+                    break
+                self.write(
+                    f"Retrying {len(failed)} emails "
+                    f"(attempt {attempt}/{retries})"
                 )
-                self.stdout.write(
-                    f"Sent reminder to {user.email} "
-                    f"({len(request_list)} requests)"
+                failed = self.send_batch(
+                    [item for item, _ in failed], rate_limiter
                 )
-            except Exception as e:
+
+            for (email, _), error in failed:
                 logger.error(
-                    f"Failed to send reminder email to {user.email}: {e}"
+                    f"Failed to send reminder email to {email.to[0]}: {error}"
                 )
-                self.stderr.write(f"Error sending to {user.email}: {e}")
+                self.write(f"Error sending to {email.to[0]}: {error}", True)
 
-        if dry_run:
-            self.stdout.write("--- DRY RUN COMPLETED ---")
+            failed_emails = {id(email) for (email, _), _ in failed}
+            sent = [
+                job
+                for email, job in outgoing
+                if id(email) not in failed_emails
+            ]
+            self.write(
+                f"Batch {index}/{batch_count}: {len(sent)} sent, "
+                f"{len(failed)} failed in "
+                f"{time.perf_counter() - started:.2f}s"
+            )
+            return sent, len(failed)
+
+        def work(index, batch):
+            try:
+                return process(index, batch)
+            finally:
+                # ワーカースレッドが開いたデータベース接続を閉じる
+                connections.close_all()
+
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(
+                    executor.map(work, range(1, batch_count + 1), batches)
+                )
         else:
-            self.stdout.write("Reminder process completed.")
+            results = [
+                process(index, batch)
+                for index, batch in enumerate(batches, start=1)
+            ]
+
+        for sent, failed in results:
+            delivered.extend(sent)
+            failed_total += failed
+
+        self.stdout.write(
+            f"Sent {len(delivered)}/{len(jobs)} reminders "
+            f"({failed_total} failed) in "
+            f"{time.perf_counter() - started_all:.2f}s "
+            f"with {workers} workers"
+        )
+        return delivered
+
+    def send_batch(self, items, rate_limiter):
+        """
+        1本の接続でメッセージを送信し、失敗したものを (item, エラー) のリストで返す。
+        """
+        failed = []
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            return [(item, e) for item in items]
+
+        try:
+            for item in items:
+                email, (_, request_list) = item
+                rate_limiter.wait()
+                try:
+                    connection.send_messages([email])
+                except Exception as e:
+                    failed.append((item, e))
+                    continue
+                self.write(
+                    f"Sent reminder to {email.to[0]} "
+                    f"({len(request_list)} requests)"
+                )
+        finally:
+            connection.close()
+        return failed
+
+    def write(self, message, error=False):
+        """ワーカースレッドからの出力が混ざらないように書き込む"""
+        with self._output_lock:
+            (self.stderr if error else self.stdout).write(message)
@@ -0,0 +1,133 @@
+import logging
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from approvals.models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued notification emails (NOTIFICATION_USE_OUTBOX). "
+        "Each batch is delivered over a single mail server connection; "
+        "failed emails are retried with exponential backoff."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Number of emails sent per batch (default: 50).",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=5,
+            help="Give up after this many failed attempts (default: 5).",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling the queue instead of exiting when empty.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to wait when the queue is empty (default: 5).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+        max_attempts = max(1, options["max_attempts"])
+
+        total_sent = total_failed = 0
+        try:
+            while True:
+                sent, failed = self.send_batch(batch_size, max_attempts)
+                total_sent += sent
+                total_failed += failed
+                if sent or failed:
+                    continue
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted.")
+
+        self.stdout.write(
+            f"Sent {total_sent} emails, {total_failed} failed attempts."
+        )
+
+    def send_batch(self, batch_size, max_attempts):
+        """
+        送信対象を1バッチ分ロックして送信し、(成功数, 失敗数) を返す。
+        複数のワーカーが動いていても同じメールを二重に送らないよう、
+        対応するデータベースではロック済みの行を読み飛ばす。
+        """
+        skip_locked = connection.features.has_select_for_update_skip_locked
+        with transaction.atomic():
+            emails = list(
+                OutboundEmail.objects.select_for_update(
+                    skip_locked=skip_locked
+                )
+                .filter(
+                    status=OutboundEmail.STATUS_PENDING,
+                    next_attempt_at__lte=timezone.now(),
+                )
+                .order_by("next_attempt_at")[:batch_size]
+            )
+            if not emails:
+                return 0, 0
+
+            sent = failed = 0
+            mail_connection = get_connection()
+            try:
+                mail_connection.open()
+                for email in emails:
+                    try:
+                        email.to_message(connection=mail_connection).send()
+                        email.mark_sent()
+                        sent += 1
+                    except Exception as e:
+                        logger.error(
+                            f"Failed to send email (Subject: "
+                            f"{email.subject}): {e}"
+                        )
+                        email.mark_failed(e, max_attempts)
+                        failed += 1
+            except Exception as e:
+                # 接続自体に失敗した場合は残り全てを失敗扱いにする
+                logger.error(f"Failed to connect to the mail server: {e}")
+                processed = sent + failed
+                for email in emails[processed:]:
+                    email.mark_failed(e, max_attempts)
+                    failed += 1
+            finally:
+                mail_connection.close()
+
+            now = timezone.now()
+            for email in emails:
+                email.updated_at = now
+
+            OutboundEmail.objects.bulk_update(
+                emails,
+                [
+                    "status",
+                    "attempts",
+                    "last_error",
+                    "next_attempt_at",
+                    "sent_at",
+                    "updated_at",
+                ],
+            )
+
+        if sent or failed:
+            self.stdout.write(f"Batch: {sent} sent, {failed} failed.")
+        return sent, failed
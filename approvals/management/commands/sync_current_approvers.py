@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from approvals.models import Request
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalculate Request.current_approver from the approval routes. "
+        "Runs automatically after migrate and after route edits in the "
+        "admin site; use it after editing approval routes in other ways."
+    )
+
+    def handle(self, *args, **options):
+        updated = Request.objects.all().sync_current_approvers()
+        self.stdout.write(f"Updated {updated} requests.")
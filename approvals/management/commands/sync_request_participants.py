@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from approvals.models import RequestParticipant
+
+
+class Command(BaseCommand):
+    help = (
+        "Register applicants and approval-route users of existing requests "
+        "as request participants (used for restricted visibility). "
+        "Runs automatically after migrate; use it after editing approval "
+        "routes outside the views and the admin site. Existing rows are kept."
+    )
+
+    def handle(self, *args, **options):
+        processed = RequestParticipant.rebuild()
+        self.stdout.write(f"Processed {processed} participant rows.")
@@ -1,4 +1,22 @@
 from . import types  # noqa: F401
-from .base import ApprovalLog, Approver, Request
+from .base import (
+    ApprovalLog,
+    Approver,
+    Request,
+    RequestNumberSequence,
+    RequestParticipant,
+)
+from .mail import DigestEntry, OutboundEmail, ReminderLedger
+from .search import RequestSearchDocument
 
-__all__ = ["Request", "Approver", "ApprovalLog"]
+__all__ = [
+    "Request",
+    "Approver",
+    "ApprovalLog",
+    "RequestNumberSequence",
+    "RequestParticipant",
+    "RequestSearchDocument",
+    "OutboundEmail",
+    "ReminderLedger",
+    "DigestEntry",
+]
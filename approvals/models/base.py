@@ -1,16 +1,139 @@
 from __future__ import annotations
 
-from typing import Any, Iterator, Optional
+import copy
+from collections import defaultdict
+from typing import Any, Optional
 
 from django import forms
 from django.conf import settings
-from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
-from django.db.models import OneToOneRel
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import MultipleObjectsReturned, ObjectDoesNotExist
+from django.db import IntegrityError, models, transaction
+from django.db.models import Exists, F, OneToOneRel, OuterRef, Q, Subquery
+from django.utils import timezone
+from django.utils.functional import classproperty
 
 from core.models import BaseModel
 
 
+class RequestQuerySet(models.QuerySet):
+    """
+    申請（Request）用のクエリセット。
+    親モデルの行を子モデル（具象申請タイプ）のインスタンスに変換する機能を持つ。
+    """
+
+    def real_instances(self) -> list[Request]:
+        """
+        クエリセットの各行を子モデルのインスタンスに変換したリストを返す。
+        親テーブルから (pk, content_type) を1回取得した後、
+        申請タイプごとに1回ずつ子モデルを取得する（並び順は維持する）。
+        select_related / prefetch_related の指定は子モデルのクエリに引き継ぐ。
+        """
+        from approvals.registry import registry
+
+        rows = list(
+            self.prefetch_related(None).values_list("pk", "content_type_id")
+        )
+
+        pks_by_type: dict[Optional[int], list[Any]] = defaultdict(list)
+        for pk, content_type_id in rows:
+            pks_by_type[content_type_id].append(pk)
+
+        instances: dict[Any, Request] = {}
+        for content_type_id, pks in pks_by_type.items():
+            model = None
+            if content_type_id is not None:
+                model = registry.get_by_content_type(
+                    ContentType.objects.get_for_id(content_type_id)
+                )
+
+            qs = (model or Request)._default_manager.filter(pk__in=pks)
+            if self.query.select_related:
+                qs.query.select_related = copy.deepcopy(
+                    self.query.select_related
+                )
+            if self._prefetch_related_lookups:
+                qs = qs.prefetch_related(*self._prefetch_related_lookups)
+
+            for obj in qs:
+                # 申請タイプ未設定の旧データは従来の方法で子モデルを探す
+                instances[obj.pk] = obj if model else obj.get_real_instance()
+
+        return [instances[pk] for pk, _ in rows if pk in instances]
+
+    def get_real(self, *args: Any, **kwargs: Any) -> Request:
+        """
+        条件に一致する1件を子モデルのインスタンスとして返す。
+        見つからない場合は DoesNotExist を送出する。
+        """
+        instances = self.filter(*args, **kwargs).real_instances()
+        if not instances:
+            raise self.model.DoesNotExist(
+                f"{self.model._meta.object_name} matching query "
+                "does not exist."
+            )
+        if len(instances) > 1:
+            raise MultipleObjectsReturned(
+                f"get_real() returned more than one "
+                f"{self.model._meta.object_name}."
+            )
+        return instances[0]
+
+    def related_to(self, user: Any) -> RequestQuerySet:
+        """
+        ユーザーが関係者（申請者・承認者）となっている申請に絞り込む。
+        関係者が未登録の申請（管理画面での作成など）も申請者本人は含める。
+        """
+        return self.filter(
+            Q(applicant=user)
+            | Exists(
+                RequestParticipant.objects.filter(
+                    request=OuterRef("pk"), user=user
+                )
+            )
+        )
+
+    def visible_to(self, user: Any) -> RequestQuerySet:
+        """
+        ユーザーが閲覧可能な申請に絞り込む。
+        閲覧制限のない申請と、閲覧制限があってもユーザーが申請者本人または
+        関係者である申請。
+        """
+        if not user.is_authenticated:
+            return self.filter(is_restricted=False)
+        return self.filter(
+            Q(is_restricted=False)
+            | Q(applicant=user)
+            | Exists(
+                RequestParticipant.objects.filter(
+                    request=OuterRef("pk"), user=user
+                )
+            )
+        )
+
+    def sync_current_approvers(self) -> int:
+        """
+        current_approver を承認ルートから再計算して一括更新する。
+        申請中のものは現在のステップの未処理承認者、それ以外は NULL とする。
+        既存データの移行や、管理画面で承認ルートを直接編集した後に使用する。
+        updated_at は更新しない（リマインダーの判定に影響させないため）。
+        """
+        current = Approver.objects.filter(
+            request=OuterRef("pk"),
+            order=OuterRef("current_step"),
+            status=Approver.STATUS_PENDING,
+        ).values("user")[:1]
+        pending = self.filter(status=Request.STATUS_PENDING).update(
+            current_approver=Subquery(current)
+        )
+        others = (
+            self.exclude(status=Request.STATUS_PENDING)
+            .exclude(current_approver=None)
+            .update(current_approver=None)
+        )
+        return pending + others
+
+
 class Request(BaseModel):
     """
     申請の基底モデル（マルチテーブル継承の親）。
@@ -54,6 +177,58 @@ class Request(BaseModel):
     is_restricted = models.BooleanField(
         default=False, verbose_name="閲覧制限フラグ"
     )
+    # 現在のステップの承認者（承認依頼一覧の検索用に状態遷移ごとに更新する）
+    current_approver = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False,
+        related_name="awaiting_requests",
+        verbose_name="現在の承認者",
+    )
+    # 具象申請タイプの識別子（子モデルへのダウンキャストに使用）
+    content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="+",
+        verbose_name="申請タイプ",
+    )
+
+    objects = RequestQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # ポータル: ステータス絞り込み + 申請日時順、承認依頼の並び順
+            models.Index(
+                fields=["status", "submitted_at"],
+                name="request_status_submitted_idx",
+            ),
+            # ポータル: 差戻し案件・自分の申請
+            models.Index(
+                fields=["applicant", "status"],
+                name="request_applicant_status_idx",
+            ),
+            # リマインダー: 申請中かつ一定時間更新のないもの
+            models.Index(
+                fields=["status", "updated_at"],
+                name="request_status_updated_idx",
+            ),
+            # ポータル: 承認依頼（自分が現在の承認者の申請中案件）
+            models.Index(
+                fields=["current_approver", "status", "submitted_at"],
+                name="request_approver_inbox_idx",
+            ),
+            # ポータル: 全申請一覧の並び順 (申請日時, id)
+            models.Index(
+                fields=["submitted_at", "id"],
+                name="request_submitted_id_idx",
+            ),
+        ]
 
     # クラスごとの設定（サブクラスでオーバーライド）
     request_prefix: str = "REQ"
@@ -65,30 +240,20 @@ class Request(BaseModel):
     def get_request_types(cls) -> list[type[Request]]:
         """
         利用可能な申請タイプ（Requestの具象サブクラス）のリストを返す。
+        起動時に構築されたレジストリを参照する。
         """
+        from approvals.registry import registry
 
-        def get_all_subs(p: type[Request]) -> Iterator[type[Request]]:
-            for sub in p.__subclasses__():
-                # 孫クラスを再帰的に取得
-                yield from get_all_subs(sub)
-                # 自身が抽象クラスでなければ返す
-                if not sub._meta.abstract:
-                    yield sub
-
-        # setで重複を除去しつつリスト化（多重継承対策）
-        return list(set(get_all_subs(cls)))
-        # subclasses = cls.__subclasses__()
-        # return [c for c in subclasses if not c._meta.abstract]
+        return [t for t in registry.types if issubclass(t, cls)]
 
     @classmethod
     def get_by_slug(cls, slug: str) -> Optional[type[Request]]:
         """
         スラッグから対応するモデルクラスを返す。
         """
-        for subclass in cls.get_request_types():
-            if subclass.get_slug() == slug:
-                return subclass
-        return None
+        from approvals.registry import registry
+
+        return registry.get_by_slug(slug)
 
     @classmethod
     def get_slug(cls) -> str:
@@ -127,6 +292,21 @@ class Request(BaseModel):
         """
         return {}
 
+    @classmethod
+    def get_search_fields(cls) -> list[str]:
+        """
+        全文検索の対象とするフィールド名のリストを返す。
+        既定では申請番号・件名と、子モデルで定義された文字列フィールド。
+        サブクラスでオーバーライドして変更できる。
+        """
+        fields = ["request_number", "title"]
+        for field in cls._meta.fields:
+            if field.model is Request or field.choices:
+                continue
+            if isinstance(field, (models.CharField, models.TextField)):
+                fields.append(field.name)
+        return fields
+
     @classmethod
     def customize_formfield(
         cls, field: models.Field, **kwargs
@@ -138,11 +318,39 @@ class Request(BaseModel):
         """
         return field.formfield(**kwargs)
 
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        # 子モデルとして保存される場合は申請タイプを記録しておく
+        if self.content_type_id is None and type(self) is not Request:
+            self.content_type = ContentType.objects.get_for_model(self)
+        super().save(*args, **kwargs)
+
+        # 検索用ドキュメントの更新（子モデルの保存時のみ、検索対象の変更時）
+        if type(self) is not Request:
+            update_fields = kwargs.get("update_fields")
+            if update_fields is None or set(update_fields) & set(
+                self.get_search_fields()
+            ):
+                from approvals.search import update_document
+
+                update_document(self)
+
     def get_real_instance(self) -> Request:
         """
         自身に関連付けられた子モデルのインスタンスを返す。
         子モデルが見つからない場合は自分自身(Request)を返す。
         """
+        if self.content_type_id is not None:
+            from approvals.registry import registry
+
+            # 記録された申請タイプから子モデルを特定し、1クエリで取得する
+            model = registry.get_by_content_type(
+                ContentType.objects.get_for_id(self.content_type_id)
+            )
+            if model is None or isinstance(self, model):
+                return self
+            return model._default_manager.get(pk=self.pk)
+
+        # 申請タイプ未設定の旧データ:
         # 関連オブジェクト（逆参照）の中から、マルチテーブル継承のリンクを探す
         for field in self._meta.get_fields():
             if isinstance(field, OneToOneRel) and field.parent_link:
@@ -197,26 +405,44 @@ class Request(BaseModel):
             data.append({"label": field.verbose_name, "value": value})
         return data
 
-    @property
-    def detail_template_name(self) -> str:
+    @classproperty
+    def detail_template_name(cls) -> str:
         """
-        詳細表示用のテンプレートパスを返す。
+        詳細表示用のテンプレートパスを返す（モデルクラスからも参照できる）。
         デフォルトは 'approvals/partials/detail_{model_name}.html'。
         """
-        return f"approvals/partials/detail_{self._meta.model_name}.html"
+        return f"approvals/partials/detail_{cls._meta.model_name}.html"
 
-    @property
-    def form_class_name(self) -> str:
+    @classproperty
+    def form_class_name(cls) -> str:
         """
-        対応するフォームクラス名を返す。
+        対応するフォームクラス名を返す（モデルクラスからも参照できる）。
         デフォルトは '{ModelName}Form'。
         """
-        return f"{self._meta.object_name}Form"
+        return f"{cls._meta.object_name}Form"
 
     @property
     def model_verbose_name(self) -> str:
         return str(self._meta.verbose_name)
 
+    def is_visible_to(self, user: Any) -> bool:
+        """
+        ユーザーがこの申請を閲覧可能か（閲覧制限の判定）。
+        管理者の扱いは呼び出し側で判断する。
+        関係者をプリフェッチ済みの場合はクエリを発行しない。
+        """
+        if not self.is_restricted:
+            return True
+        if not user.is_authenticated:
+            return False
+        # 関係者が未登録の申請でも申請者本人は閲覧できる
+        if self.applicant_id == user.pk:
+            return True
+        cache = getattr(self, "_prefetched_objects_cache", {})
+        if "participants" in cache:
+            return any(p.user_id == user.pk for p in cache["participants"])
+        return self.participants.filter(user=user).exists()
+
     def __str__(self) -> str:
         return f"{self.request_number}: {self.title}"
 
@@ -258,6 +484,13 @@ class Approver(BaseModel):
 
     class Meta:
         ordering = ["order"]
+        indexes = [
+            # 各ビュー: 申請の特定ステップの承認者
+            models.Index(
+                fields=["request", "order"],
+                name="approver_request_order_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         # Userモデルのメソッドを使うが、ここは遅延インポート等は不要
@@ -308,6 +541,195 @@ class ApprovalLog(BaseModel):
 
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            # 申請詳細: 履歴ログの時系列表示
+            models.Index(
+                fields=["request", "created_at"],
+                name="approval_log_req_created_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.request.request_number} - {self.get_action_display()}"
+
+
+class RequestParticipant(BaseModel):
+    """
+    申請の関係者（申請者・承認者）モデル。
+    閲覧制限の判定や「自分に関係する申請」の絞り込みに使う。
+    申請・再申請時に追加し、承認ルートから外れても削除しない
+    （過去の承認者も引き続き閲覧できる）。
+    """
+
+    ROLE_APPLICANT = 1
+    ROLE_APPROVER = 2
+
+    ROLE_CHOICES = [
+        (ROLE_APPLICANT, "Applicant (申請者)"),
+        (ROLE_APPROVER, "Approver (承認者)"),
+    ]
+
+    request = models.ForeignKey(
+        Request, on_delete=models.CASCADE, related_name="participants"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="request_participations",
+        verbose_name="ユーザー",
+    )
+    role = models.IntegerField(choices=ROLE_CHOICES, verbose_name="役割")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["request", "user", "role"],
+                name="unique_request_participant",
+            )
+        ]
+        indexes = [
+            # 閲覧制限・関係者の判定 (ユーザー → 申請)
+            models.Index(
+                fields=["user", "request"],
+                name="participant_user_request_idx",
+            ),
+        ]
+
+    @classmethod
+    def record(cls, request_obj: Request, approvers: list[Any]) -> None:
+        """
+        申請者と承認ルートのユーザーを関係者として登録する（登録済みは無視）。
+        """
+        participants = [
+            cls(
+                request=request_obj,
+                user=request_obj.applicant,
+                role=cls.ROLE_APPLICANT,
+            )
+        ]
+        participants += [
+            cls(request=request_obj, user=user, role=cls.ROLE_APPROVER)
+            for user in approvers
+        ]
+        cls.objects.bulk_create(participants, ignore_conflicts=True)
+
+    @classmethod
+    def rebuild(
+        cls,
+        requests: Optional[models.QuerySet] = None,
+        batch_size: int = 1000,
+    ) -> int:
+        """
+        既存の申請・承認ルートから関係者を一括登録する（登録済みは無視）。
+        既存データの移行に使用する。処理した行数を返す。
+        """
+        if requests is None:
+            requests = Request.objects.all()
+
+        def rows():
+            for request_id, user_id in requests.values_list(
+                "pk", "applicant_id"
+            ).iterator(chunk_size=batch_size):
+                yield cls(
+                    request_id=request_id,
+                    user_id=user_id,
+                    role=cls.ROLE_APPLICANT,
+                )
+            for request_id, user_id in (
+                Approver.objects.filter(request__in=requests)
+                .values_list("request_id", "user_id")
+                .iterator(chunk_size=batch_size)
+            ):
+                yield cls(
+                    request_id=request_id,
+                    user_id=user_id,
+                    role=cls.ROLE_APPROVER,
+                )
+
+        count = 0
+        batch: list[RequestParticipant] = []
+        for participant in rows():
+            batch.append(participant)
+            if len(batch) >= batch_size:
+                cls.objects.bulk_create(batch, ignore_conflicts=True)
+                count += len(batch)
+                batch = []
+        if batch:
+            cls.objects.bulk_create(batch, ignore_conflicts=True)
+            count += len(batch)
+        return count
+
+    def __str__(self) -> str:
+        return f"{self.request.request_number} - {self.get_role_display()}"
+
+
+class RequestNumberSequence(BaseModel):
+    """
+    申請番号の採番テーブル。
+    (プレフィックス, 年月) ごとに1行を持ち、最後に払い出した連番を保持する。
+    申請テーブル全体をロックせずに、該当行の更新ロックだけで採番できる。
+    """
+
+    prefix = models.CharField(max_length=10, verbose_name="プレフィックス")
+    yyyymm = models.CharField(max_length=6, verbose_name="年月")
+    last_number = models.PositiveIntegerField(
+        default=0, verbose_name="最終連番"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["prefix", "yyyymm"],
+                name="unique_request_number_sequence",
+            )
+        ]
+
+    @classmethod
+    def next_value(cls, prefix: str, yyyymm: str) -> int:
+        """
+        指定された (prefix, yyyymm) の次の連番を払い出す。
+        呼び出し側のトランザクション内で実行すること。
+        更新した行はコミットまでロックされるため、同じ種別・同じ月の
+        採番のみが直列化され、他の種別の採番はブロックされない。
+        """
+        qs = cls.objects.filter(prefix=prefix, yyyymm=yyyymm)
+        increment = {
+            "last_number": F("last_number") + 1,
+            "updated_at": timezone.now(),
+        }
+
+        if not qs.update(**increment):
+            # その月の初回のみ行を作成してから再度インクリメントする
+            cls._create_row(prefix, yyyymm)
+            qs.update(**increment)
+
+        return qs.values_list("last_number", flat=True).get()
+
+    @classmethod
+    def _create_row(cls, prefix: str, yyyymm: str) -> None:
+        """
+        採番行を作成する。
+        採番テーブル導入前に発行済みの申請番号があれば、その続きから開始する。
+        """
+        latest = (
+            Request.objects.filter(
+                request_number__startswith=f"{prefix}-{yyyymm}-"
+            )
+            .order_by("-request_number")
+            .values_list("request_number", flat=True)
+            .first()
+        )
+        last_number = int(latest.split("-")[-1]) if latest else 0
+
+        try:
+            # 同時に作成された場合は一意制約違反になるので、
+            # セーブポイントで巻き戻して既存の行を使う
+            with transaction.atomic():
+                cls.objects.create(
+                    prefix=prefix, yyyymm=yyyymm, last_number=last_number
+                )
+        except IntegrityError:
+            pass
+
+    def __str__(self) -> str:
+        return f"{self.prefix}-{self.yyyymm}: {self.last_number}"
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import models
+from django.utils import timezone
+
+from core.models import BaseModel
+
+from .base import Request
+
+
+class OutboundEmail(BaseModel):
+    """
+    送信待ちメール（アウトボックス）モデル。
+    通知メールは申請・承認と同じトランザクション内でこのテーブルに登録し、
+    送信は send_queued_emails コマンド（ワーカー）が非同期に行う。
+    """
+
+    STATUS_PENDING = 0
+    STATUS_SENT = 1
+    STATUS_FAILED = 9
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending (送信待ち)"),
+        (STATUS_SENT, "Sent (送信済)"),
+        (STATUS_FAILED, "Failed (送信失敗)"),
+    ]
+
+    subject = models.CharField(max_length=255, verbose_name="件名")
+    body = models.TextField(verbose_name="本文")
+    from_email = models.CharField(max_length=255, verbose_name="送信元")
+    to = models.JSONField(default=list, verbose_name="宛先(To)")
+    cc = models.JSONField(default=list, blank=True, verbose_name="宛先(Cc)")
+    status = models.IntegerField(
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name="ステータス",
+    )
+    attempts = models.IntegerField(default=0, verbose_name="送信試行回数")
+    last_error = models.TextField(blank=True, verbose_name="最後のエラー")
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now, verbose_name="次回送信日時"
+    )
+    sent_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="送信日時"
+    )
+
+    class Meta:
+        verbose_name = "送信待ちメール"
+        verbose_name_plural = "送信待ちメール"
+        indexes = [
+            # ワーカー: 送信対象の取得
+            models.Index(
+                fields=["status", "next_attempt_at"],
+                name="outbound_email_queue_idx",
+            ),
+        ]
+
+    def to_message(self, connection=None) -> EmailMessage:
+        """送信用の EmailMessage を組み立てる"""
+        return EmailMessage(
+            subject=self.subject,
+            body=self.body,
+            from_email=self.from_email,
+            to=self.to,
+            cc=self.cc,
+            connection=connection,
+        )
+
+    def mark_sent(self) -> None:
+        self.status = self.STATUS_SENT
+        self.attempts += 1
+        self.sent_at = timezone.now()
+        self.last_error = ""
+
+    def mark_failed(self, error: Exception, max_attempts: int) -> None:
+        """
+        送信失敗を記録する。
+        上限回数に達するまでは指数バックオフで再送を予約する。
+        """
+        self.attempts += 1
+        self.last_error = str(error)
+        if self.attempts >= max_attempts:
+            self.status = self.STATUS_FAILED
+        else:
+            delay = min(2 ** (self.attempts - 1), 60)
+            self.next_attempt_at = timezone.now() + timedelta(minutes=delay)
+
+    def __str__(self) -> str:
+        return f"{self.subject} -> {', '.join(self.to)}"
+
+
+class ReminderLedger(BaseModel):
+    """
+    リマインダー送信記録モデル。
+    申請と承認者の組ごとに最後にリマインダーを送った日時を保持し、
+    send_approval_reminders --since-last-run で同じ承認者への再送を抑止する。
+    """
+
+    request = models.ForeignKey(
+        Request,
+        on_delete=models.CASCADE,
+        related_name="reminder_entries",
+        verbose_name="申請",
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="承認者",
+    )
+    last_reminded_at = models.DateTimeField(verbose_name="最終リマインド日時")
+
+    class Meta:
+        verbose_name = "リマインダー送信記録"
+        verbose_name_plural = "リマインダー送信記録"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["request", "user"], name="unique_reminder_ledger"
+            ),
+        ]
+
+    @classmethod
+    def record(cls, pairs, reminded_at=None) -> None:
+        """
+        (申請ID, ユーザーID) の組ごとに送信日時を記録する（既存は上書き）。
+        """
+        reminded_at = reminded_at or timezone.now()
+        cls.objects.bulk_create(
+            [
+                cls(
+                    request_id=request_id,
+                    user_id=user_id,
+                    last_reminded_at=reminded_at,
+                )
+                for request_id, user_id in pairs
+            ],
+            update_conflicts=True,
+            unique_fields=["request", "user"],
+            update_fields=["last_reminded_at", "updated_at"],
+        )
+
+    def __str__(self) -> str:
+        return f"{self.request_id} -> {self.user_id}"
+
+
+class DigestEntry(BaseModel):
+    """
+    まとめ送信待ちの通知モデル。
+    通知メールのまとめ送信 (User.email_digest) を選んだユーザーへの通知は
+    1件ずつ送らずにこのテーブルに溜め、flush_notification_digests コマンドが
+    ユーザーごとに1通のメールにまとめて送信する。
+    claimed_at は送信中のコマンドが設定し、送信できた通知だけを削除する。
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="digest_entries",
+        verbose_name="宛先",
+    )
+    request = models.ForeignKey(
+        Request,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="申請",
+    )
+    event = models.CharField(max_length=32, verbose_name="イベント")
+    summary = models.CharField(max_length=255, verbose_name="概要")
+    link = models.CharField(max_length=500, verbose_name="リンク")
+    claimed_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="送信処理の開始日時"
+    )
+
+    class Meta:
+        verbose_name = "まとめ送信待ちの通知"
+        verbose_name_plural = "まとめ送信待ちの通知"
+        indexes = [
+            # コマンド: ユーザーごとに古い順で取得
+            models.Index(
+                fields=["user", "created_at"],
+                name="digest_entry_user_created_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.summary} -> {self.user_id}"
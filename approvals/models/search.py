@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from django.db import models
+
+from core.models import BaseModel
+
+from .base import Request
+
+
+class RequestSearchDocument(BaseModel):
+    """
+    申請の検索用ドキュメント（非正規化）。
+    親モデル・子モデルの検索対象フィールドを連結した本文と、
+    n-gram に分割したトークンを保持する。
+    全文検索インデックス（SQLite FTS5 / PostgreSQL tsvector）は
+    approvals.search がこのテーブルに対して作成する。
+    主キーは FTS5 の content_rowid とするため整数にする
+    （SQLite の INTEGER PRIMARY KEY は rowid の別名で、VACUUM でも変わらない）。
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    request = models.OneToOneField(
+        Request, on_delete=models.CASCADE, related_name="search_document"
+    )
+    content = models.TextField(verbose_name="検索対象テキスト")
+    tokens = models.TextField(verbose_name="検索トークン")
+
+    def __str__(self) -> str:
+        return str(self.request_id)
@@ -0,0 +1,117 @@
+"""
+通知メールの宛先 (To / Cc) の決定。
+
+申請の承認ルート（承認者とそのユーザー）を1回のクエリでまとめて取得し、
+各イベントの宛先はメモリ上で求める。
+承認ルートが prefetch_related("approvers__user") 済みの場合はそれを使い、
+クエリを発行しない。
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from .models import Approver
+
+if TYPE_CHECKING:
+    from accounts.models import User
+    from approvals.models import Request
+
+Recipients = tuple[list["User"], list["User"]]
+
+
+def _unique(users: Iterable[Optional[User]]) -> list[User]:
+    """重複と None を除いたユーザーのリスト（順序は保つ）"""
+    result: list[User] = []
+    seen = set()
+    for user in users:
+        if user is None or user.pk in seen:
+            continue
+        seen.add(user.pk)
+        result.append(user)
+    return result
+
+
+class RecipientResolver:
+    """
+    申請1件分の通知先を求める。
+    各メソッドは (To のユーザーリスト, Cc のユーザーリスト) を返す。
+    """
+
+    def __init__(self, request_obj: Request) -> None:
+        self.request_obj = request_obj
+        self._approvers: Optional[list[Approver]] = None
+
+    @property
+    def approvers(self) -> list[Approver]:
+        """承認順に並べた承認者（ユーザーを結合済み）"""
+        if self._approvers is None:
+            cache = getattr(self.request_obj, "_prefetched_objects_cache", {})
+            prefetched = cache.get("approvers")
+            if prefetched is not None and all(
+                Approver.user.is_cached(approver) for approver in prefetched
+            ):
+                approvers = sorted(prefetched, key=lambda a: a.order)
+            else:
+                approvers = list(
+                    self.request_obj.approvers.select_related("user").order_by(
+                        "order"
+                    )
+                )
+            self._approvers = approvers
+        return self._approvers
+
+    def _users(self, status: Optional[int] = None) -> list[User]:
+        return _unique(
+            approver.user
+            for approver in self.approvers
+            if status is None or approver.status == status
+        )
+
+    def approved_users(self) -> list[User]:
+        """承認済みの承認者"""
+        return self._users(status=Approver.STATUS_APPROVED)
+
+    def for_approved(self) -> Recipients:
+        """承認完了: To 申請者 / Cc 全承認者"""
+        return [self.request_obj.applicant], self._users()
+
+    def for_remanded(self, actor: User) -> Recipients:
+        """差戻し: To 申請者 / Cc 実行者 + 承認済みの承認者"""
+        cc = _unique([actor, *self.approved_users()])
+        return [self.request_obj.applicant], cc
+
+    def for_rejected(self, actor: User) -> Recipients:
+        """却下: To 申請者 / Cc 実行者 + 承認済みの承認者"""
+        return self.for_remanded(actor)
+
+    def for_withdrawn(self) -> Recipients:
+        """
+        取り下げ: To 現在の承認者 / Cc 承認済みの承認者。
+        現在の承認者がいない場合は承認済みの承認者全員を To とする。
+        """
+        step = self.request_obj.current_step
+        current = [
+            approver.user
+            for approver in self.approvers
+            if approver.status == Approver.STATUS_PENDING
+            and approver.order == step
+        ]
+        approved = self.approved_users()
+        if current:
+            return current[:1], approved
+        return approved, []
+
+    def for_proxy_remanded(self) -> Recipients:
+        """
+        代理差戻し: To 申請者 / Cc 承認済みの承認者 + 現在のステップの承認者
+        （現在のステップの承認者は呼び出し元で Remanded にしている）
+        """
+        step = self.request_obj.current_step
+        cc = _unique(
+            approver.user
+            for approver in self.approvers
+            if approver.status == Approver.STATUS_APPROVED
+            or approver.order == step
+        )
+        return [self.request_obj.applicant], cc
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Iterable, Optional
+
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+
+if TYPE_CHECKING:
+    from django import forms
+    from django.contrib.contenttypes.models import ContentType
+
+    from approvals.models import Request
+
+# 申請タイプ専用の部分テンプレートがない場合の詳細表示
+DEFAULT_DETAIL_TEMPLATE = "approvals/partials/detail_default.html"
+
+# 変更されたら解決済みのテンプレート・フォームクラスを破棄する設定名
+RESOLVE_SETTINGS = {"TEMPLATES", "INSTALLED_APPS"}
+
+
+class RequestTypeRegistry:
+    """
+    申請タイプ（Requestの具象サブクラス）のレジストリ。
+    アプリ起動時 (ApprovalsConfig.ready) に一度だけ構築し、
+    スラッグ・プレフィックス・コンテンツタイプからモデルクラスを辞書で引く。
+    詳細画面の部分テンプレートとフォームクラスは初回の参照時に解決し、
+    モデルクラスごとに保持する。
+    """
+
+    def __init__(self) -> None:
+        self._types: list[type[Request]] = []
+        self._by_slug: dict[str, type[Request]] = {}
+        self._by_prefix: dict[str, type[Request]] = {}
+        self._by_label: dict[str, type[Request]] = {}
+        self._menu_entries: list[dict[str, Any]] = []
+        self._detail_templates: dict[type[Request], str] = {}
+        self._form_classes: dict[type[Request], type[forms.ModelForm]] = {}
+        self._ready = False
+
+    def _discover(self) -> list[type[Request]]:
+        """
+        インストール済みモデルから申請タイプを収集する。
+        プロキシモデルは親と同じテーブル・プレフィックスを共有するため除外する。
+        """
+        from approvals.models import Request
+
+        return [
+            model
+            for model in apps.get_models()
+            if issubclass(model, Request)
+            and model is not Request
+            and not model._meta.proxy
+        ]
+
+    def build(self, models: Optional[Iterable[type[Request]]] = None) -> None:
+        """
+        レジストリを構築する。
+        スラッグ・プレフィックスが重複している場合は起動時に例外とする。
+        """
+        if models is None:
+            models = self._discover()
+
+        by_slug: dict[str, type[Request]] = {}
+        by_prefix: dict[str, type[Request]] = {}
+        by_label: dict[str, type[Request]] = {}
+
+        for model in models:
+            slug = model.get_slug()
+            if slug in by_slug:
+                raise ImproperlyConfigured(
+                    f"申請タイプのスラッグ '{slug}' が重複しています: "
+                    f"{by_slug[slug].__name__}, {model.__name__}"
+                )
+            prefix = model.request_prefix
+            if prefix in by_prefix:
+                raise ImproperlyConfigured(
+                    f"申請タイプのプレフィックス '{prefix}' が重複しています: "
+                    f"{by_prefix[prefix].__name__}, {model.__name__}"
+                )
+            by_slug[slug] = model
+            by_prefix[prefix] = model
+            by_label[model._meta.label_lower] = model
+
+        # メニュー用の表示情報（名前順）
+        menu_entries = [
+            {"slug": slug, "name": str(model._meta.verbose_name)}
+            for slug, model in by_slug.items()
+        ]
+        menu_entries.sort(key=lambda x: x["name"])
+
+        self._types = list(by_slug.values())
+        self._by_slug = by_slug
+        self._by_prefix = by_prefix
+        self._by_label = by_label
+        self._menu_entries = menu_entries
+        self.clear_resolved()
+        self._ready = True
+
+    def _ensure_ready(self) -> None:
+        if not self._ready:
+            self.build()
+
+    @property
+    def types(self) -> list[type[Request]]:
+        """登録されている申請タイプのリスト"""
+        self._ensure_ready()
+        return list(self._types)
+
+    @property
+    def menu_entries(self) -> list[dict[str, Any]]:
+        """新規申請メニュー用の {slug, name} のリスト（名前順）"""
+        self._ensure_ready()
+        return list(self._menu_entries)
+
+    def get_by_slug(self, slug: Optional[str]) -> Optional[type[Request]]:
+        self._ensure_ready()
+        return self._by_slug.get(slug) if slug else None
+
+    def get_by_prefix(self, prefix: str) -> Optional[type[Request]]:
+        self._ensure_ready()
+        return self._by_prefix.get(prefix)
+
+    def get_by_content_type(
+        self, content_type: ContentType
+    ) -> Optional[type[Request]]:
+        self._ensure_ready()
+        label = f"{content_type.app_label}.{content_type.model}"
+        return self._by_label.get(label)
+
+    def get_detail_template(self, model: type[Request]) -> str:
+        """
+        詳細画面で読み込む部分テンプレート名を返す。
+        model.detail_template_name が存在しなければ既定のテンプレートとする。
+        テンプレートの存在確認はモデルごとに初回のみ行う。
+        """
+        template_name = self._detail_templates.get(model)
+        if template_name is None:
+            template_name = model.detail_template_name
+            try:
+                get_template(template_name)
+            except TemplateDoesNotExist:
+                template_name = DEFAULT_DETAIL_TEMPLATE
+            self._detail_templates[model] = template_name
+        return template_name
+
+    def get_form_class(self, model: type[Request]) -> type[forms.ModelForm]:
+        """
+        申請の入力フォームのクラスを返す。
+        approvals.forms に model.form_class_name のフォームが定義されていれば
+        それを使い、なければ create_request_form_class で生成する。
+        どちらの場合もモデルごとに初回のみ解決・生成し、同じクラスを返す
+        （フォームのフィールドはインスタンス化のたびに複製されるため共有できる）。
+        """
+        form_class = self._form_classes.get(model)
+        if form_class is None:
+            from django.forms import BaseModelForm
+
+            from approvals import forms as approval_forms
+
+            form_class = getattr(approval_forms, model.form_class_name, None)
+            if not (
+                isinstance(form_class, type)
+                and issubclass(form_class, BaseModelForm)
+            ):
+                form_class = approval_forms.create_request_form_class(model)
+            self._form_classes[model] = form_class
+        return form_class
+
+    def clear_resolved(self, **kwargs) -> None:
+        """
+        解決済みの部分テンプレート・フォームクラスを破棄する
+        （setting_changed / file_changed のハンドラ）。
+        """
+        setting = kwargs.get("setting")
+        if setting is not None and setting not in RESOLVE_SETTINGS:
+            return
+        self._detail_templates.clear()
+        self._form_classes.clear()
+
+
+registry = RequestTypeRegistry()
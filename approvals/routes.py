@@ -0,0 +1,42 @@
+"""
+承認ルート (Approver) から導出するデータの同期。
+
+申請・再申請・承認アクションのビューは関係者 (RequestParticipant) と
+現在の承認者 (Request.current_approver) を自身で更新するが、
+管理画面で承認ルートを編集した場合はここで同期する（approvals.admin）。
+既存データは post_migrate で同期する（ApprovalsConfig.ready で接続）。
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Iterable
+
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+
+logger = logging.getLogger(__name__)
+
+
+def sync_routes(request_ids: Iterable[Any]) -> None:
+    """指定した申請の関係者・現在の承認者を承認ルートから同期する"""
+    from approvals.models import Request, RequestParticipant
+
+    requests = Request.objects.filter(pk__in=list(request_ids))
+    requests.sync_current_approvers()
+    RequestParticipant.rebuild(requests)
+
+
+def backfill_routes(using: str = DEFAULT_DB_ALIAS, **kwargs) -> None:
+    """
+    全ての申請について承認ルートから導出するデータを同期する
+    （post_migrate のハンドラ。結果は承認ルートのみで決まるため何度実行してもよい）。
+    """
+    from approvals.models import Request, RequestParticipant
+
+    if using != DEFAULT_DB_ALIAS:
+        return
+    try:
+        Request.objects.all().sync_current_approvers()
+        RequestParticipant.rebuild(Request.objects.all())
+    except DatabaseError as e:
+        logger.warning(f"Failed to sync approval routes: {e}")
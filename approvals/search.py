@@ -0,0 +1,334 @@
+"""
+申請の全文検索。
+
+申請ごとの検索用ドキュメント (RequestSearchDocument) を n-gram (2文字) の
+トークン列として保持し、データベースごとの全文検索インデックスで検索する。
+
+* SQLite: FTS5 仮想テーブル（ドキュメントテーブルを外部コンテンツとし、
+  トリガーで同期）。bm25 で順位付けする。
+* PostgreSQL: to_tsvector('simple', tokens) の GIN 式インデックス。
+  ts_rank で順位付けする。
+* その他 / 1文字の検索語: 部分一致 (icontains) にフォールバックする。
+
+インデックスは post_migrate で作成する（ApprovalsConfig.ready で接続）。
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import unicodedata
+from typing import Optional
+
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.models import FloatField, Q, QuerySet, Value
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "approvals_request_fts"
+PG_INDEX = "approvals_search_tokens_gin"
+
+_WORD_RE = re.compile(r"\w+")
+
+# データベース接続ごとの全文検索インデックスの有無
+_availability: dict[str, bool] = {}
+
+
+def normalize(text: str) -> str:
+    """全角・半角などの表記ゆれを吸収する (NFKC + 小文字化)"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def _runs(text: str) -> list[str]:
+    """記号・空白で区切られた文字列の並びを返す"""
+    return _WORD_RE.findall(normalize(text))
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    文字列を 2-gram のトークンに分割する。
+    分かち書きのない日本語でも部分一致で検索できるようにするため。
+    1文字だけの並びはそのまま1トークンとする。
+    """
+    tokens: list[str] = []
+    for run in _runs(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(a + b for a, b in zip(run, run[1:]))
+    return tokens
+
+
+def query_tokens(query: str) -> Optional[list[str]]:
+    """
+    検索語をトークンに分割する（重複は除く）。
+    1文字の並びを含む場合は 2-gram のインデックスで検索できないため None を返す。
+    """
+    runs = _runs(query)
+    if not runs or any(len(run) == 1 for run in runs):
+        return None
+    return list(dict.fromkeys(tokenize(query)))
+
+
+def build_document(request_obj) -> tuple[str, str]:
+    """申請から (検索対象テキスト, トークン列) を作る"""
+    values = []
+    for name in request_obj.get_search_fields():
+        value = getattr(request_obj, name, None)
+        if value:
+            values.append(str(value))
+    content = normalize("\n".join(values))
+    return content, " ".join(tokenize(content))
+
+
+def update_document(request_obj) -> None:
+    """申請の検索用ドキュメントを作成・更新する"""
+    from approvals.models import RequestSearchDocument
+
+    content, tokens = build_document(request_obj)
+    RequestSearchDocument.objects.update_or_create(
+        request_id=request_obj.pk,
+        defaults={"content": content, "tokens": tokens},
+    )
+
+
+class SearchBackend:
+    """
+    全文検索インデックスを使わない検索（部分一致）。
+    各データベース向けの実装の基底クラスを兼ねる。
+    """
+
+    def setup(self, connection) -> None:
+        pass
+
+    def is_available(self, connection) -> bool:
+        return True
+
+    def search(self, queryset: QuerySet, query: str) -> QuerySet:
+        keyword = normalize(query).strip()
+        return queryset.filter(
+            Q(title__icontains=query)
+            | Q(request_number__icontains=query)
+            | Q(search_document__content__icontains=keyword)
+        ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    @staticmethod
+    def _document_table() -> str:
+        from approvals.models import RequestSearchDocument
+
+        return RequestSearchDocument._meta.db_table
+
+    @staticmethod
+    def _document_key() -> str:
+        """ドキュメントテーブルの整数の主キー列（FTS5 の content_rowid）"""
+        from approvals.models import RequestSearchDocument
+
+        return RequestSearchDocument._meta.pk.column
+
+    @staticmethod
+    def _outer_pk(queryset: QuerySet) -> str:
+        """相関サブクエリから参照する外側の主キー列"""
+        opts = queryset.model._meta
+        return f'"{opts.db_table}"."{opts.pk.column}"'
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """SQLite FTS5 による全文検索"""
+
+    def triggers(self) -> dict[str, str]:
+        """ドキュメントテーブルと FTS5 テーブルを同期するトリガー"""
+        doc = self._document_table()
+        key = self._document_key()
+        return {
+            f"{FTS_TABLE}_ai": (
+                f"AFTER INSERT ON {doc} BEGIN "
+                f"INSERT INTO {FTS_TABLE}(rowid, tokens) "
+                f"VALUES (new.{key}, new.tokens); END"
+            ),
+            f"{FTS_TABLE}_ad": (
+                f"AFTER DELETE ON {doc} BEGIN "
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, tokens) "
+                f"VALUES ('delete', old.{key}, old.tokens); END"
+            ),
+            f"{FTS_TABLE}_au": (
+                f"AFTER UPDATE ON {doc} BEGIN "
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, tokens) "
+                f"VALUES ('delete', old.{key}, old.tokens); "
+                f"INSERT INTO {FTS_TABLE}(rowid, tokens) "
+                f"VALUES (new.{key}, new.tokens); END"
+            ),
+        }
+
+    def setup(self, connection) -> None:
+        """
+        FTS5 テーブルと同期用のトリガーを作成する。
+        マイグレーションでドキュメントテーブルが作り直されるとトリガーも
+        削除されるため、post_migrate のたびに確認して不足分を作成し、
+        その間の変更を取り込むためにインデックスを再構築する。
+        定義（content_rowid など）の異なる既存の FTS5 テーブルは作り直す。
+        """
+        doc = self._document_table()
+        definition = (
+            f"fts5(tokens, content='{doc}', "
+            f"content_rowid='{self._document_key()}')"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' "
+                "AND name = %s",
+                [FTS_TABLE],
+            )
+            row = cursor.fetchone()
+            created = row is None or definition not in row[0]
+            if row is not None and created:
+                logger.warning(
+                    f"Recreating full-text search table {FTS_TABLE}"
+                )
+                for name in self.triggers():
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+                cursor.execute(f"DROP TABLE {FTS_TABLE}")
+            if created:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING {definition}"
+                )
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                "AND tbl_name = %s",
+                [doc],
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+            missing = {
+                name: body
+                for name, body in self.triggers().items()
+                if name not in existing
+            }
+            for name, body in missing.items():
+                cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+            if missing and not created:
+                logger.warning(
+                    "Recreated full-text search triggers: "
+                    + ", ".join(sorted(missing))
+                )
+            if created or missing:
+                # トリガーがなかった間（または作成前）の変更を取り込む
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+                )
+
+    def is_available(self, connection) -> bool:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                "AND name = %s",
+                [FTS_TABLE],
+            )
+            return cursor.fetchone() is not None
+
+    def search(self, queryset: QuerySet, query: str) -> QuerySet:
+        tokens = query_tokens(query)
+        if tokens is None:
+            return super().search(queryset, query)
+
+        # 各トークンをフレーズとして AND 検索する
+        match = " ".join(f'"{token}"' for token in tokens)
+        doc = self._document_table()
+        key = self._document_key()
+        ids = RawSQL(
+            f"SELECT d.request_id FROM {FTS_TABLE} "
+            f"JOIN {doc} d ON d.{key} = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s",
+            [match],
+        )
+        # bm25 は小さいほど適合度が高いため符号を反転する
+        rank = RawSQL(
+            f"SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = ("
+            f"SELECT d.{key} FROM {doc} d "
+            f"WHERE d.request_id = {self._outer_pk(queryset)})",
+            [match],
+            output_field=FloatField(),
+        )
+        return queryset.filter(pk__in=ids).annotate(search_rank=rank)
+
+
+class PostgreSQLBackend(SearchBackend):
+    """PostgreSQL の tsvector による全文検索"""
+
+    def setup(self, connection) -> None:
+        doc = self._document_table()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON {doc} "
+                f"USING gin (to_tsvector('simple', tokens))"
+            )
+
+    def is_available(self, connection) -> bool:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_indexes WHERE indexname = %s", [PG_INDEX]
+            )
+            return cursor.fetchone() is not None
+
+    def search(self, queryset: QuerySet, query: str) -> QuerySet:
+        tokens = query_tokens(query)
+        if tokens is None:
+            return super().search(queryset, query)
+
+        terms = " ".join(tokens)
+        doc = self._document_table()
+        ids = RawSQL(
+            f"SELECT request_id FROM {doc} "
+            f"WHERE to_tsvector('simple', tokens) "
+            f"@@ plainto_tsquery('simple', %s)",
+            [terms],
+        )
+        rank = RawSQL(
+            f"SELECT ts_rank(to_tsvector('simple', d.tokens), "
+            f"plainto_tsquery('simple', %s)) FROM {doc} d "
+            f"WHERE d.request_id = {self._outer_pk(queryset)}",
+            [terms],
+            output_field=FloatField(),
+        )
+        return queryset.filter(pk__in=ids).annotate(search_rank=rank)
+
+
+BACKENDS: dict[str, type[SearchBackend]] = {
+    "sqlite": SQLiteFTS5Backend,
+    "postgresql": PostgreSQLBackend,
+}
+
+
+def get_backend(using: str = DEFAULT_DB_ALIAS) -> SearchBackend:
+    """
+    データベースに応じた検索バックエンドを返す。
+    全文検索インデックスが未作成の場合は部分一致の検索を返す。
+    """
+    connection = connections[using]
+    backend = BACKENDS.get(connection.vendor, SearchBackend)()
+    if using not in _availability:
+        _availability[using] = backend.is_available(connection)
+    return backend if _availability[using] else SearchBackend()
+
+
+def search_requests(queryset: QuerySet, query: str) -> QuerySet:
+    """
+    申請のクエリセットを検索語で絞り込み、適合度 (search_rank) を付与する。
+    search_rank は大きいほど適合度が高い。
+    """
+    return get_backend(queryset.db).search(queryset, query)
+
+
+def setup_search_backend(using: str = DEFAULT_DB_ALIAS, **kwargs) -> None:
+    """
+    全文検索インデックスを作成する（post_migrate のハンドラ）。
+    FTS5 が使えない SQLite などでは部分一致の検索になる。
+    """
+    connection = connections[using]
+    backend = BACKENDS.get(connection.vendor, SearchBackend)()
+    try:
+        backend.setup(connection)
+        _availability[using] = backend.is_available(connection)
+    except DatabaseError as e:
+        logger.warning(f"Full-text search index is not available: {e}")
+        _availability[using] = False
@@ -5,10 +5,13 @@ from typing import TYPE_CHECKING, Any, Optional, Union
 
 from django.conf import settings
 from django.core.mail import EmailMessage
-from django.template.loader import render_to_string
 from django.urls import reverse
 
-from .models import Approver
+from core.sites import build_absolute_url
+
+from . import emails
+from .models import DigestEntry, OutboundEmail
+from .recipients import RecipientResolver
 
 if TYPE_CHECKING:
     from django.http import HttpRequest
@@ -27,20 +30,37 @@ class NotificationService:
     @staticmethod
     def _send_email(
         to_user: Union[User, list[User], None],
-        subject: str,
-        template_name: str,
+        event: str,
         context: dict[str, Any],
         cc_users: Optional[list[User]] = None,
+        fail_silently: bool = True,
     ) -> None:
         """
         内部用: メール送信実行メソッド
         Args:
             to_user: 送信先ユーザー (Userモデルインスタンス) またはそのリスト
-            subject: 件名
-            template_name: テンプレートファイル名
+            event: 通知イベント (approvals.emails.EMAIL_EVENTS のキー)
             context: テンプレート用コンテキスト
             cc_users: CC送付先ユーザーリスト (Userモデルインスタンスのリスト)
+            fail_silently: False の場合、送信エラーをログに記録した後に送出する
         """
+        # まとめ送信を選んだユーザーへの通知は溜めておく
+        # (flush_notification_digests が1通にまとめて送信する)
+        if (
+            event in emails.DIGEST_EVENTS
+            and not isinstance(to_user, list)
+            and getattr(to_user, "email_digest", False)
+            and not cc_users
+        ):
+            DigestEntry.objects.create(
+                user=to_user,
+                request=context["request_obj"],
+                event=event,
+                summary=emails.render_summary(event, context),
+                link=context["link"],
+            )
+            return
+
         # 送信先リストの作成 (TO)
         to_emails: list[str] = []
         if isinstance(to_user, list):
@@ -57,13 +77,27 @@ class NotificationService:
                 if u.email and u.email not in to_emails:
                     cc_emails.append(u.email)
 
+        subject = emails.render_subject(event, context)
         if not to_emails:
             logger.warning(
                 f"No valid TO email addresses for subject: {subject}"
             )
             return
 
-        message_body = render_to_string(template_name, context)
+        message_body = emails.render_body(event, context)
+
+        if settings.NOTIFICATION_USE_OUTBOX:
+            # 送信はワーカー (send_queued_emails) に任せる。
+            # 呼び出し元のトランザクション内で登録するため、
+            # 申請・承認がロールバックされた場合はメールも送られない。
+            OutboundEmail.objects.create(
+                subject=subject,
+                body=message_body,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=to_emails,
+                cc=cc_emails,
+            )
+            return
 
         try:
             email = EmailMessage(
@@ -79,6 +113,8 @@ class NotificationService:
                 f"Failed to send email (Subject: {subject}): {e}",
                 exc_info=True,
             )
+            if not fail_silently:
+                raise
 
     @classmethod
     def _get_detail_url(
@@ -91,8 +127,8 @@ class NotificationService:
         if request:
             return request.build_absolute_uri(path)
 
-        # requestがない場合のフォールバック（簡易的）
-        return f"http://localhost:8000{path}"
+        # requestがない場合（管理コマンド・ワーカー）は Site のドメインを使う
+        return build_absolute_url(path)
 
     @classmethod
     def send_approval_request(
@@ -105,14 +141,10 @@ class NotificationService:
         承認依頼
         To: 次の承認者 (next_approver)
         """
-        subject = f"[{settings.PROJECT_NAME}] 承認依頼: {request_obj.title}"
-        context = {
-            "request_obj": request_obj,
-            "link": cls._get_detail_url(request_obj, request),
-        }
-        cls._send_email(
-            next_approver, subject, "emails/approval_request.txt", context
+        context = emails.request_context(
+            request_obj, cls._get_detail_url(request_obj, request)
         )
+        cls._send_email(next_approver, "approval_request", context)
 
     @classmethod
     def send_resubmitted(
@@ -125,14 +157,10 @@ class NotificationService:
         再申請通知
         To: 最初の承認者
         """
-        subject = f"[{settings.PROJECT_NAME}] 再承認依頼: {request_obj.title}"
-        context = {
-            "request_obj": request_obj,
-            "link": cls._get_detail_url(request_obj, request),
-        }
-        cls._send_email(
-            first_approver, subject, "emails/resubmitted.txt", context
+        context = emails.request_context(
+            request_obj, cls._get_detail_url(request_obj, request)
         )
+        cls._send_email(first_approver, "resubmitted", context)
 
     @classmethod
     def send_approved(
@@ -143,18 +171,15 @@ class NotificationService:
         To: 申請者
         Cc: 全承認者
         """
-        cc_users = [approver.user for approver in request_obj.approvers.all()]
+        to_users, cc_users = RecipientResolver(request_obj).for_approved()
 
-        subject = f"[{settings.PROJECT_NAME}] 承認完了: {request_obj.title}"
-        context = {
-            "request_obj": request_obj,
-            "link": cls._get_detail_url(request_obj, request),
-        }
+        context = emails.request_context(
+            request_obj, cls._get_detail_url(request_obj, request)
+        )
 
         cls._send_email(
-            request_obj.applicant,
-            subject,
-            "emails/approved.txt",
+            to_users,
+            "approved",
             context,
             cc_users=cc_users,
         )
@@ -172,29 +197,20 @@ class NotificationService:
         To: 申請者
         Cc: 本承認者(実行者) + 承認済の過去の承認者
         """
-        cc_users_set = {actor}  # 実行者 (setで重複排除)
+        to_users, cc_users = RecipientResolver(request_obj).for_remanded(actor)
 
-        # 承認済みの承認者
-        approved_approvers = request_obj.approvers.filter(
-            status=Approver.STATUS_APPROVED
+        context = emails.action_context(
+            request_obj,
+            actor,
+            comment,
+            cls._get_detail_url(request_obj, request),
         )
-        for approver in approved_approvers:
-            cc_users_set.add(approver.user)
-
-        subject = f"[{settings.PROJECT_NAME}] 差戻し: {request_obj.title}"
-        context = {
-            "request_obj": request_obj,
-            "actor": actor,
-            "comment": comment,
-            "link": cls._get_detail_url(request_obj, request),
-        }
 
         cls._send_email(
-            request_obj.applicant,
-            subject,
-            "emails/remanded.txt",
+            to_users,
+            "remanded",
             context,
-            cc_users=list(cc_users_set),
+            cc_users=cc_users,
         )
 
     @classmethod
@@ -210,29 +226,20 @@ class NotificationService:
         To: 申請者
         Cc: 実行者 + 承認済みの承認者
         """
-        cc_users_set = {actor}  # 実行者 (setで重複排除)
+        to_users, cc_users = RecipientResolver(request_obj).for_rejected(actor)
 
-        # 承認済みの承認者
-        approved_approvers = request_obj.approvers.filter(
-            status=Approver.STATUS_APPROVED
+        context = emails.action_context(
+            request_obj,
+            actor,
+            comment,
+            cls._get_detail_url(request_obj, request),
         )
-        for approver in approved_approvers:
-            cc_users_set.add(approver.user)
-
-        subject = f"[{settings.PROJECT_NAME}] 却下: {request_obj.title}"
-        context = {
-            "request_obj": request_obj,
-            "actor": actor,
-            "comment": comment,
-            "link": cls._get_detail_url(request_obj, request),
-        }
 
         cls._send_email(
-            request_obj.applicant,
-            subject,
-            "emails/rejected.txt",
+            to_users,
+            "rejected",
             context,
-            cc_users=list(cc_users_set),
+            cc_users=cc_users,
         )
 
     @classmethod
@@ -244,43 +251,20 @@ class NotificationService:
         To: 現在の承認者(Pending)
         Cc: 承認済みの承認者
         """
-        # To: 現在の承認者
-        current_approver_obj = request_obj.approvers.filter(
-            status=Approver.STATUS_PENDING, order=request_obj.current_step
-        ).first()
+        # 現在の承認者がいない場合(イレギュラー)は承認済みの承認者全員が To
+        to_users, cc_users = RecipientResolver(request_obj).for_withdrawn()
 
-        to_user = current_approver_obj.user if current_approver_obj else None
-
-        # Cc: 承認済みの承認者
-        approved_approvers = request_obj.approvers.filter(
-            status=Approver.STATUS_APPROVED
+        context = emails.request_context(
+            request_obj, cls._get_detail_url(request_obj, request)
         )
-        cc_users = [approver.user for approver in approved_approvers]
-
-        subject = f"[{settings.PROJECT_NAME}] 取り下げ: {request_obj.title}"
-        context = {
-            "request_obj": request_obj,
-            "link": cls._get_detail_url(request_obj, request),
-        }
 
-        if to_user:
+        if to_users:
             cls._send_email(
-                to_user,
-                subject,
-                "emails/withdrawn.txt",
+                to_users,
+                "withdrawn",
                 context,
                 cc_users=cc_users,
             )
-        else:
-            # 万が一現在の承認者がいない場合(イレギュラー)はCcの人にToで送るなどの救済が必要だが
-            # ここではCcの人だけに送る形にする（to_userリスト対応済みロジックにて）
-            if cc_users:
-                cls._send_email(
-                    cc_users,  # リストを渡して全員TOにする
-                    subject,
-                    "emails/withdrawn.txt",
-                    context,
-                )
 
     @classmethod
     def send_proxy_remanded(
@@ -295,32 +279,34 @@ class NotificationService:
         To: 申請者
         Cc: 承認済みの人 + 現在の担当者
         """
-        # 承認済みの承認者
-        approved = request_obj.approvers.filter(
-            status=Approver.STATUS_APPROVED
+        to_users, cc_users = RecipientResolver(
+            request_obj
+        ).for_proxy_remanded()
+
+        context = emails.action_context(
+            request_obj,
+            actor,
+            comment,
+            cls._get_detail_url(request_obj, request),
         )
-        # 現在の承認者（Pending かつ 現在のステップ）
-        #   呼び出し元で Remanded にしている
-        current = request_obj.approvers.filter(
-            # status=Approver.STATUS_PENDING,
-            order=request_obj.current_step
-        )
-
-        related = approved | current
-        cc_users = list(set(approver.user for approver in related))
-
-        subject = f"[{settings.PROJECT_NAME}] 代理差戻し: {request_obj.title}"
-        context = {
-            "request_obj": request_obj,
-            "actor": actor,
-            "comment": comment,
-            "link": cls._get_detail_url(request_obj, request),
-        }
 
         cls._send_email(
-            request_obj.applicant,
-            subject,
-            "emails/proxy_remanded.txt",
+            to_users,
+            "proxy_remanded",
             context,
             cc_users=cc_users,
         )
+
+    @classmethod
+    def send_digest(cls, user: User, entries: list[DigestEntry]) -> None:
+        """
+        まとめ通知
+        To: まとめ送信を選んだユーザー
+        送信に失敗した場合は例外を送出する（呼び出し側で通知を残して再送する）。
+        """
+        cls._send_email(
+            user,
+            "digest",
+            emails.digest_context(user, entries),
+            fail_silently=False,
+        )
@@ -1,14 +1,28 @@
+import json
 from datetime import timedelta
 from io import StringIO
+from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.contrib.sites.models import Site
 from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
 from django.core.management import call_command
-from django.test import TestCase
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
-from approvals.models import Approver
+from approvals.models import (
+    Approver,
+    DigestEntry,
+    OutboundEmail,
+    ReminderLedger,
+    Request,
+)
 from approvals.models.types import SimpleRequest
+from approvals.services import NotificationService
+from core.sites import clear_site_url_cache
 
 User = get_user_model()
 
@@ -45,6 +59,9 @@ class SendApprovalRemindersTest(TestCase):
             title=title,
             applicant=applicant,
             status=status,
+            current_approver=(
+                approver if status == SimpleRequest.STATUS_PENDING else None
+            ),
             content="test content",
             submitted_at=updated_at,  # 申請日時は適当に
         )
@@ -121,6 +138,167 @@ class SendApprovalRemindersTest(TestCase):
         output = out.getvalue()
         self.assertIn("Found 3 stalled requests", output)
 
+    def test_query_count_is_constant(self):
+        """対象の申請数によらずクエリ数が一定であること"""
+
+        def run():
+            Site.objects.clear_cache()
+            clear_site_url_cache()
+            with CaptureQueriesContext(connection) as ctx:
+                call_command(
+                    "send_approval_reminders", dry_run=True, stdout=StringIO()
+                )
+            return len(ctx)
+
+        self.create_request(
+            "old_1", self.applicant, self.approver_a, self.old_time
+        )
+        baseline = run()
+
+        for i in range(5):
+            self.create_request(
+                f"old_more_{i}",
+                self.applicant,
+                self.approver_b if i % 2 else self.approver_a,
+                self.old_time,
+            )
+        self.assertEqual(run(), baseline)
+
+    def test_batches_and_retry(self):
+        """バッチごとに送信し、失敗したメッセージを再送すること"""
+        self.create_request(
+            "old_a", self.applicant, self.approver_a, self.old_time
+        )
+        self.create_request(
+            "old_b", self.applicant, self.approver_b, self.old_time
+        )
+
+        original = EmailBackend.send_messages
+        calls = []
+
+        def flaky_send(backend, messages):
+            # 最初の1回だけ失敗させる
+            calls.append(messages)
+            if len(calls) == 1:
+                raise OSError("temporary failure")
+            return original(backend, messages)
+
+        out = StringIO()
+        with mock.patch.object(
+            EmailBackend,
+            "send_messages",
+            autospec=True,
+            side_effect=flaky_send,
+        ):
+            call_command(
+                "send_approval_reminders", "--batch-size=1", stdout=out
+            )
+
+        self.assertEqual(len(mail.outbox), 2)
+        output = out.getvalue()
+        self.assertIn("Batch 1/2: 1 sent, 0 failed", output)
+        self.assertIn("Batch 2/2: 1 sent, 0 failed", output)
+        self.assertIn("Retrying 1 emails (attempt 1/2)", output)
+        self.assertIn("Sent 2/2 reminders", output)
+
+    def test_parallel_workers(self):
+        """ワーカー数を指定しても全員に1通ずつ送信されること"""
+        approver_c = User.objects.create_user(email="approver_c@example.com")
+        for name, approver in [
+            ("old_a", self.approver_a),
+            ("old_b", self.approver_b),
+            ("old_c", approver_c),
+        ]:
+            self.create_request(name, self.applicant, approver, self.old_time)
+
+        out = StringIO()
+        with mock.patch.object(
+            connections, "close_all", wraps=connections.close_all
+        ) as close_all:
+            call_command(
+                "send_approval_reminders",
+                "--workers=3",
+                "--batch-size=1",
+                "--rate-limit=1000",
+                stdout=out,
+            )
+
+        # ワーカースレッドはバッチごとにデータベース接続を閉じる
+        self.assertEqual(close_all.call_count, 3)
+        self.assertEqual(
+            sorted(e.to[0] for e in mail.outbox),
+            [
+                "approver_a@example.com",
+                "approver_b@example.com",
+                "approver_c@example.com",
+            ],
+        )
+        self.assertIn("Sent 3/3 reminders (0 failed)", out.getvalue())
+
+    def test_dry_run_order_is_deterministic(self):
+        """dry-run は承認者のメールアドレス順に出力されること"""
+        self.create_request(
+            "old_b", self.applicant, self.approver_b, self.old_time
+        )
+        self.create_request(
+            "old_a", self.applicant, self.approver_a, self.old_time
+        )
+
+        out = StringIO()
+        call_command(
+            "send_approval_reminders", "--dry-run", "--workers=4", stdout=out
+        )
+        output = out.getvalue()
+        self.assertLess(
+            output.index("Would send email to: approver_a@example.com"),
+            output.index("Would send email to: approver_b@example.com"),
+        )
+
+    def test_since_last_run(self):
+        """
+        送信済みの申請は状態が変わるか送信間隔が過ぎるまで再送しないこと
+        """
+        req = self.create_request(
+            "old", self.applicant, self.approver_a, self.old_time
+        )
+
+        call_command("send_approval_reminders", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        entry = ReminderLedger.objects.get(request=req, user=self.approver_a)
+
+        # 送信直後は対象外
+        out = StringIO()
+        call_command("send_approval_reminders", "--since-last-run", stdout=out)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("No requests found for reminder.", out.getvalue())
+
+        # 送信間隔が過ぎたら再送する
+        ReminderLedger.objects.filter(pk=entry.pk).update(
+            last_reminded_at=self.now - timedelta(hours=2)
+        )
+        call_command(
+            "send_approval_reminders",
+            "--since-last-run",
+            "--interval-hours=1",
+            stdout=StringIO(),
+        )
+        self.assertEqual(len(mail.outbox), 2)
+
+        # 送信後に状態が変わった（承認者が替わった）場合も再送する
+        SimpleRequest.objects.filter(pk=req.pk).update(
+            current_approver=self.approver_b,
+            updated_at=self.old_time + timedelta(minutes=1),
+        )
+        ReminderLedger.objects.filter(pk=entry.pk).update(
+            last_reminded_at=self.old_time
+        )
+        call_command(
+            "send_approval_reminders", "--since-last-run", stdout=StringIO()
+        )
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[-1].to, ["approver_b@example.com"])
+        self.assertEqual(ReminderLedger.objects.filter(request=req).count(), 2)
+
     def test_dry_run(self):
         # 1. 対象の申請を作成
         self.create_request(
@@ -140,3 +318,183 @@ class SendApprovalRemindersTest(TestCase):
         self.assertIn("Would send email to: approver_a@example.com", output)
         self.assertIn("old_dry", output)
         self.assertIn("--- DRY RUN COMPLETED ---", output)
+
+
+class BenchmarkRequestCreationTest(TransactionTestCase):
+    @override_settings(DEBUG=True)
+    def test_benchmark_reports_metrics(self):
+        out = StringIO()
+        call_command(
+            "benchmark_request_creation",
+            workers=1,
+            iterations=2,
+            json=True,
+            stdout=out,
+        )
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["expected_flows"], 2)
+        self.assertEqual(report["completed_flows"], 2)
+        self.assertEqual(report["operations"]["create"]["count"], 2)
+        self.assertEqual(report["operations"]["approve"]["count"], 4)
+        self.assertEqual(report["duplicate_numbers"], 0)
+
+        # ベンチマークデータは削除されていること
+        self.assertFalse(Request.objects.exists())
+        self.assertFalse(User.objects.exists())
+
+
+class BenchmarkEmailRenderingTest(TestCase):
+    def test_benchmark_reports_both_modes(self):
+        out = StringIO()
+        call_command(
+            "benchmark_email_rendering", "--count=16", "--json", stdout=out
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["count"], 16)
+        self.assertEqual(set(report["modes"]), {"render_to_string", "cached"})
+
+
+class BenchmarkRequestFormsTest(TestCase):
+    def test_benchmark_reports_both_paths(self):
+        out = StringIO()
+        call_command(
+            "benchmark_request_forms", "--count=4", "--json", stdout=out
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["count"], 4)
+        self.assertEqual(set(report["paths"]), {"create", "update"})
+        self.assertIn("cached", report["paths"]["update"])
+
+
+@override_settings(NOTIFICATION_USE_OUTBOX=True)
+class SendQueuedEmailsTest(TestCase):
+    """
+    送信待ちメールのワーカーのテスト。
+    """
+
+    def setUp(self):
+        self.applicant = User.objects.create_user(email="q-app@example.com")
+        self.approver = User.objects.create_user(email="q-apr@example.com")
+        self.req = SimpleRequest.objects.create(
+            request_number="REQ-Q1",
+            title="キュー",
+            applicant=self.applicant,
+            content="test",
+        )
+
+    def test_enqueue_and_send(self):
+        """通知は即時送信されずに登録され、ワーカーが送信すること"""
+        NotificationService.send_approval_request(self.req, self.approver)
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.to, ["q-apr@example.com"])
+
+        out = StringIO()
+        call_command("send_queued_emails", stdout=out)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("承認依頼", mail.outbox[0].subject)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, OutboundEmail.STATUS_SENT)
+        self.assertIn("Sent 1 emails", out.getvalue())
+
+    def test_failed_send_is_retried_then_given_up(self):
+        NotificationService.send_approval_request(self.req, self.approver)
+
+        with mock.patch(
+            "django.core.mail.EmailMessage.send",
+            side_effect=OSError("connection refused"),
+        ):
+            call_command(
+                "send_queued_emails", "--max-attempts=2", stdout=StringIO()
+            )
+            queued = OutboundEmail.objects.get()
+            self.assertEqual(queued.status, OutboundEmail.STATUS_PENDING)
+            self.assertEqual(queued.attempts, 1)
+            self.assertGreater(queued.next_attempt_at, timezone.now())
+
+            # 再送時刻を過ぎたものとして再実行すると上限で失敗扱いになる
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            call_command(
+                "send_queued_emails", "--max-attempts=2", stdout=StringIO()
+            )
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, OutboundEmail.STATUS_FAILED)
+        self.assertEqual(queued.last_error, "connection refused")
+        self.assertEqual(len(mail.outbox), 0)
+
+
+class FlushNotificationDigestsTest(TestCase):
+    """
+    通知のまとめ送信のテスト。
+    """
+
+    def setUp(self):
+        self.applicant = User.objects.create_user(email="d-app@example.com")
+        self.digest_user = User.objects.create_user(
+            email="d-apr@example.com", email_digest=True
+        )
+        self.instant_user = User.objects.create_user(email="d-now@example.com")
+        self.requests = [
+            SimpleRequest.objects.create(
+                request_number=f"REQ-D{i}",
+                title=f"まとめ{i}",
+                applicant=self.applicant,
+                content="test",
+            )
+            for i in range(3)
+        ]
+
+    def test_digest_is_flushed_as_one_email(self):
+        """まとめ送信のユーザーへの通知が1通にまとめて送られること"""
+        for req in self.requests:
+            NotificationService.send_approval_request(req, self.digest_user)
+        NotificationService.send_approval_request(
+            self.requests[0], self.instant_user
+        )
+
+        # まとめ送信を選んでいないユーザーには即時に送る
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["d-now@example.com"])
+        self.assertEqual(DigestEntry.objects.count(), 3)
+
+        out = StringIO()
+        call_command("flush_notification_digests", stdout=out)
+
+        self.assertEqual(len(mail.outbox), 2)
+        digest = mail.outbox[1]
+        self.assertEqual(digest.to, ["d-apr@example.com"])
+        self.assertEqual(digest.subject, "[ポポン] 通知のまとめ")
+        for req in self.requests:
+            self.assertIn(req.request_number, digest.body)
+        self.assertFalse(DigestEntry.objects.exists())
+        self.assertIn(
+            "Sent 1 digests covering 3 notifications.", out.getvalue()
+        )
+
+    def test_entries_survive_failed_send(self):
+        """送信に失敗した通知は削除されず、次回の実行で送られること"""
+        for req in self.requests:
+            NotificationService.send_approval_request(req, self.digest_user)
+
+        with (
+            mock.patch(
+                "django.core.mail.EmailMessage.send",
+                side_effect=OSError("connection refused"),
+            ),
+            self.assertLogs("approvals.services", level="ERROR"),
+        ):
+            out = StringIO()
+            call_command("flush_notification_digests", stdout=out)
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            DigestEntry.objects.filter(claimed_at__isnull=True).count(), 3
+        )
+        self.assertIn("3 kept for retry", out.getvalue())
+
+        call_command("flush_notification_digests", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(DigestEntry.objects.exists())
@@ -0,0 +1,93 @@
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from approvals.models import ApprovalLog, Approver, Request
+from approvals.models.types import SimpleRequest
+
+User = get_user_model()
+
+
+@skipUnless(
+    connection.vendor in ("sqlite", "postgresql"),
+    "Query plan assertions are implemented for SQLite and PostgreSQL.",
+)
+class QueryPlanIndexTest(TestCase):
+    """
+    ポータル・リマインダー等の主要クエリがインデックスを使うことの確認。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.applicant = User.objects.create_user(email="plan@example.com")
+        cls.approver = User.objects.create_user(email="plan-a@example.com")
+        for i in range(20):
+            req = SimpleRequest.objects.create(
+                request_number=f"REQ-PLAN-{i:04d}",
+                title=f"plan {i}",
+                applicant=cls.applicant,
+                status=i % 4,
+                submitted_at=timezone.now(),
+                content="plan",
+            )
+            Approver.objects.create(request=req, user=cls.approver, order=1)
+            ApprovalLog.objects.create(
+                request=req,
+                actor=cls.applicant,
+                action=ApprovalLog.ACTION_SUBMIT,
+            )
+
+    def explain(self, qs):
+        """
+        実行計画を返す。PostgreSQL では件数が少ないとシーケンシャル
+        スキャンが選ばれるため、トランザクション内で無効化して確認する。
+        """
+        if connection.vendor == "postgresql":
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+                return qs.explain()
+        return qs.explain()
+
+    def assertUsesIndex(self, qs, index_name):
+        plan = self.explain(qs)
+        self.assertIn(index_name, plan, msg=f"\n{plan}")
+
+    def test_portal_status_filter(self):
+        qs = Request.objects.filter(status=Request.STATUS_APPROVED).order_by(
+            "-submitted_at"
+        )
+        self.assertUsesIndex(qs, "request_status_submitted_idx")
+
+    def test_portal_remanded_requests(self):
+        qs = Request.objects.filter(
+            applicant=self.applicant, status=Request.STATUS_REMANDED
+        )
+        self.assertUsesIndex(qs, "request_applicant_status_idx")
+
+    def test_portal_pending_approvals(self):
+        # ポータルの承認待ち (portal.views) と同じクエリ
+        qs = (
+            Request.objects.filter(
+                status=Request.STATUS_PENDING, current_approver=self.approver
+            )
+            .select_related("applicant")
+            .order_by("submitted_at")
+        )
+        self.assertUsesIndex(qs, "request_approver_inbox_idx")
+
+    def test_reminder_stalled_requests(self):
+        qs = Request.objects.filter(
+            status=Request.STATUS_PENDING,
+            updated_at__lte=timezone.now() - timedelta(hours=24),
+        )
+        self.assertUsesIndex(qs, "request_status_updated_idx")
+
+    def test_detail_logs(self):
+        req = Request.objects.first()
+        qs = ApprovalLog.objects.filter(request=req).order_by("created_at")
+        self.assertUsesIndex(qs, "approval_log_req_created_idx")
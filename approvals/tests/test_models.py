@@ -0,0 +1,436 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.forms import ModelForm
+from django.template.loader import get_template
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from approvals.models import (
+    Approver,
+    Request,
+    RequestNumberSequence,
+    RequestParticipant,
+)
+from approvals.models.types import LocalBusinessTripRequest, SimpleRequest
+from approvals.registry import (
+    DEFAULT_DETAIL_TEMPLATE,
+    RequestTypeRegistry,
+    registry,
+)
+from approvals.routes import backfill_routes
+
+User = get_user_model()
+
+
+class RequestNumberSequenceTest(TestCase):
+    """
+    申請番号採番テーブルのテスト。
+    """
+
+    def test_next_value_is_independent_per_prefix(self):
+        """プレフィックス・年月ごとに独立して採番されること"""
+        with transaction.atomic():
+            self.assertEqual(
+                RequestNumberSequence.next_value("REQ-S", "202601"), 1
+            )
+            self.assertEqual(
+                RequestNumberSequence.next_value("REQ-S", "202601"), 2
+            )
+            self.assertEqual(
+                RequestNumberSequence.next_value("REQ-L", "202601"), 1
+            )
+            self.assertEqual(
+                RequestNumberSequence.next_value("REQ-S", "202602"), 1
+            )
+
+        self.assertEqual(RequestNumberSequence.objects.count(), 3)
+
+    def test_next_value_continues_existing_numbers(self):
+        """採番テーブル導入前の申請番号の続きから採番されること"""
+        applicant = User.objects.create_user(email="seq@example.com")
+        SimpleRequest.objects.create(
+            request_number="REQ-S-202601-0007",
+            title="既存申請",
+            applicant=applicant,
+            content="test",
+        )
+
+        with transaction.atomic():
+            value = RequestNumberSequence.next_value("REQ-S", "202601")
+
+        self.assertEqual(value, 8)
+
+
+class RequestTypeRegistryTest(SimpleTestCase):
+    """
+    申請タイプレジストリのテスト。
+    """
+
+    def test_lookup(self):
+        """スラッグ・プレフィックスからモデルクラスを引けること"""
+        self.assertIs(registry.get_by_slug("simple"), SimpleRequest)
+        self.assertIs(registry.get_by_slug("trip"), LocalBusinessTripRequest)
+        self.assertIsNone(registry.get_by_slug("unknown"))
+        self.assertIs(
+            registry.get_by_prefix("REQ-L"), LocalBusinessTripRequest
+        )
+        self.assertIs(Request.get_by_slug("simple"), SimpleRequest)
+        self.assertEqual(
+            set(Request.get_request_types()),
+            {SimpleRequest, LocalBusinessTripRequest},
+        )
+
+    def test_menu_entries_sorted_by_name(self):
+        """メニュー用の情報が名前順で返ること"""
+        names = [entry["name"] for entry in registry.menu_entries]
+        self.assertEqual(names, sorted(names))
+        self.assertIn(
+            {"slug": "simple", "name": "簡易承認申請"}, registry.menu_entries
+        )
+
+    def test_duplicate_slug_is_rejected(self):
+        """スラッグが重複している場合は構築時に例外となること"""
+
+        class DuplicateSlugRequest(SimpleRequest):
+            request_prefix = "REQ-DUP"
+            url_slug = "simple"
+
+            class Meta:
+                proxy = True
+                app_label = "approvals"
+
+        with self.assertRaises(ImproperlyConfigured):
+            RequestTypeRegistry().build([SimpleRequest, DuplicateSlugRequest])
+
+    def test_duplicate_prefix_is_rejected(self):
+        """プレフィックスが重複している場合は構築時に例外となること"""
+
+        class DuplicatePrefixRequest(SimpleRequest):
+            url_slug = "duplicate-prefix"
+
+            class Meta:
+                proxy = True
+                app_label = "approvals"
+
+        with self.assertRaises(ImproperlyConfigured):
+            RequestTypeRegistry().build(
+                [SimpleRequest, DuplicatePrefixRequest]
+            )
+
+    def test_detail_template_is_resolved_once(self):
+        """部分テンプレートの存在確認はモデルごとに初回のみ行うこと"""
+
+        class NoTemplateRequest(SimpleRequest):
+            class Meta:
+                proxy = True
+                app_label = "approvals"
+
+        target = RequestTypeRegistry()
+        with mock.patch(
+            "approvals.registry.get_template",
+            wraps=get_template,
+        ) as probe:
+            for _ in range(3):
+                self.assertEqual(
+                    target.get_detail_template(SimpleRequest),
+                    "approvals/partials/detail_simplerequest.html",
+                )
+                self.assertEqual(
+                    target.get_detail_template(NoTemplateRequest),
+                    DEFAULT_DETAIL_TEMPLATE,
+                )
+        self.assertEqual(probe.call_count, 2)
+
+        target.clear_resolved(setting="TEMPLATES")
+        with mock.patch(
+            "approvals.registry.get_template", wraps=get_template
+        ) as probe:
+            target.get_detail_template(SimpleRequest)
+        self.assertEqual(probe.call_count, 1)
+
+    def test_form_class(self):
+        """フォームの定義がない申請タイプはフォームクラスを生成すること"""
+        form_class = registry.get_form_class(SimpleRequest)
+        self.assertTrue(issubclass(form_class, ModelForm))
+        self.assertIs(form_class._meta.model, SimpleRequest)
+        self.assertEqual(SimpleRequest.form_class_name, "SimpleRequestForm")
+
+    def test_form_class_is_memoized(self):
+        """同じモデルクラスには同じフォームクラスを返すこと"""
+        target = RequestTypeRegistry()
+        FormClass = target.get_form_class(SimpleRequest)
+        self.assertIs(target.get_form_class(SimpleRequest), FormClass)
+
+        # フォームのフィールド（ウィジェット）はインスタンスごとに別物
+        form1, form2 = FormClass(), FormClass()
+        form1.fields["title"].widget.attrs["class"] = "changed"
+        self.assertEqual(
+            form2.fields["title"].widget.attrs["class"], "form-control"
+        )
+
+        target.clear_resolved(setting="TEMPLATES")
+        self.assertIsNot(target.get_form_class(SimpleRequest), FormClass)
+
+
+class RequestDowncastTest(TestCase):
+    """
+    子モデルへのダウンキャスト（申請タイプ識別子）のテスト。
+    """
+
+    def setUp(self):
+        self.applicant = User.objects.create_user(email="cast@example.com")
+        self.simple1 = SimpleRequest.objects.create(
+            request_number="REQ-CAST-1",
+            title="簡易1",
+            applicant=self.applicant,
+            content="test",
+        )
+        self.trip = LocalBusinessTripRequest.objects.create(
+            request_number="REQ-CAST-2",
+            title="出張",
+            applicant=self.applicant,
+            trip_date="2026-01-10",
+            destination="大阪",
+        )
+        self.simple2 = SimpleRequest.objects.create(
+            request_number="REQ-CAST-3",
+            title="簡易2",
+            applicant=self.applicant,
+            content="test",
+        )
+
+    def test_content_type_is_recorded(self):
+        """子モデルの保存時に申請タイプが記録されること"""
+        req = Request.objects.get(pk=self.trip.pk)
+        self.assertEqual(
+            req.content_type.model_class(), LocalBusinessTripRequest
+        )
+
+    def test_get_real_instance_single_query(self):
+        """get_real_instance は1クエリで子モデルを返すこと"""
+        req = Request.objects.get(pk=self.trip.pk)
+        with self.assertNumQueries(1):
+            real = req.get_real_instance()
+        self.assertIsInstance(real, LocalBusinessTripRequest)
+        self.assertEqual(real.destination, "大阪")
+
+    def test_real_instances_one_query_per_type(self):
+        """一覧のダウンキャストは申請タイプごとに1クエリで順序を保つこと"""
+        qs = Request.objects.order_by("request_number")
+        with self.assertNumQueries(3):
+            instances = qs.real_instances()
+
+        self.assertEqual(
+            [type(obj) for obj in instances],
+            [SimpleRequest, LocalBusinessTripRequest, SimpleRequest],
+        )
+        self.assertEqual(
+            [obj.pk for obj in instances],
+            [self.simple1.pk, self.trip.pk, self.simple2.pk],
+        )
+
+    def test_real_instances_keeps_select_related(self):
+        """select_related の指定が子モデルのクエリに引き継がれること"""
+        qs = Request.objects.filter(pk=self.simple1.pk).select_related(
+            "applicant"
+        )
+        instances = qs.real_instances()
+        with self.assertNumQueries(0):
+            self.assertEqual(instances[0].applicant, self.applicant)
+
+    def test_get_real_does_not_exist(self):
+        """該当がない場合は DoesNotExist となること"""
+        with self.assertRaises(Request.DoesNotExist):
+            Request.objects.get_real(request_number="NOTHING")
+
+
+class CurrentApproverSyncTest(TestCase):
+    """
+    current_approver の一括再計算のテスト。
+    """
+
+    def test_sync_current_approvers(self):
+        applicant = User.objects.create_user(email="sync@example.com")
+        approver1 = User.objects.create_user(email="sync-a1@example.com")
+        approver2 = User.objects.create_user(email="sync-a2@example.com")
+
+        pending = SimpleRequest.objects.create(
+            request_number="REQ-SYNC-1",
+            title="申請中",
+            applicant=applicant,
+            status=Request.STATUS_PENDING,
+            current_step=2,
+            content="test",
+        )
+        Approver.objects.create(
+            request=pending,
+            user=approver1,
+            order=1,
+            status=Approver.STATUS_APPROVED,
+        )
+        Approver.objects.create(request=pending, user=approver2, order=2)
+
+        remanded = SimpleRequest.objects.create(
+            request_number="REQ-SYNC-2",
+            title="差戻し",
+            applicant=applicant,
+            status=Request.STATUS_REMANDED,
+            current_approver=approver1,
+            content="test",
+        )
+        Approver.objects.create(
+            request=remanded,
+            user=approver1,
+            order=1,
+            status=Approver.STATUS_REMANDED,
+        )
+
+        Request.objects.all().sync_current_approvers()
+
+        pending.refresh_from_db()
+        remanded.refresh_from_db()
+        self.assertEqual(pending.current_approver, approver2)
+        self.assertIsNone(remanded.current_approver)
+
+    def test_admin_route_change_and_backfill(self):
+        """管理画面での承認者の変更と post_migrate で再計算されること"""
+        applicant = User.objects.create_user(email="sync-b@example.com")
+        approver1 = User.objects.create_user(email="sync-b1@example.com")
+        approver2 = User.objects.create_user(email="sync-b2@example.com")
+        admin = User.objects.create_user(
+            email="sync-admin@example.com",
+            is_active=True,
+            is_staff=True,
+            is_superuser=True,
+        )
+        req = SimpleRequest.objects.create(
+            request_number="REQ-SYNC-3",
+            title="ルート変更",
+            applicant=applicant,
+            status=Request.STATUS_PENDING,
+            current_step=1,
+            current_approver=approver1,
+            content="test",
+        )
+        route = Approver.objects.create(request=req, user=approver1, order=1)
+
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse("admin:approvals_approver_change", args=[route.pk]),
+            {
+                "request": req.pk,
+                "user": approver2.pk,
+                "order": 1,
+                "status": Approver.STATUS_PENDING,
+            },
+        )
+        self.assertRedirects(
+            response, reverse("admin:approvals_approver_changelist")
+        )
+        req.refresh_from_db()
+        self.assertEqual(req.current_approver, approver2)
+
+        # 既存データ（未設定）は post_migrate で再計算する
+        Request.objects.filter(pk=req.pk).update(current_approver=None)
+        backfill_routes()
+        req.refresh_from_db()
+        self.assertEqual(req.current_approver, approver2)
+
+
+class RequestParticipantTest(TestCase):
+    """
+    関係者テーブルによる閲覧制限のテスト。
+    """
+
+    def setUp(self):
+        self.applicant = User.objects.create_user(email="rp@example.com")
+        self.approver = User.objects.create_user(email="rp-a@example.com")
+        self.other = User.objects.create_user(email="rp-o@example.com")
+        self.public = SimpleRequest.objects.create(
+            request_number="REQ-RP-1",
+            title="公開",
+            applicant=self.applicant,
+            content="test",
+        )
+        self.restricted = SimpleRequest.objects.create(
+            request_number="REQ-RP-2",
+            title="非公開",
+            applicant=self.applicant,
+            is_restricted=True,
+            content="test",
+        )
+        Approver.objects.create(
+            request=self.restricted, user=self.approver, order=1
+        )
+
+    def test_rebuild_and_visibility(self):
+        """既存データから関係者を登録し、閲覧可能な申請を絞り込めること"""
+        RequestParticipant.rebuild()
+        # 再実行しても重複しない
+        RequestParticipant.rebuild()
+        self.assertEqual(RequestParticipant.objects.count(), 3)
+
+        def visible(user):
+            return set(
+                Request.objects.visible_to(user).values_list(
+                    "title", flat=True
+                )
+            )
+
+        self.assertEqual(visible(self.approver), {"公開", "非公開"})
+        self.assertEqual(visible(self.other), {"公開"})
+        self.assertEqual(
+            set(
+                Request.objects.related_to(self.approver).values_list(
+                    "title", flat=True
+                )
+            ),
+            {"非公開"},
+        )
+        self.assertTrue(self.restricted.is_visible_to(self.approver))
+        self.assertFalse(self.restricted.is_visible_to(self.other))
+
+    def test_applicant_sees_own_request_without_participants(self):
+        """関係者が未登録でも申請者本人は閲覧できること"""
+        self.assertFalse(RequestParticipant.objects.exists())
+        self.assertTrue(self.restricted.is_visible_to(self.applicant))
+        self.assertEqual(
+            set(
+                Request.objects.visible_to(self.applicant).values_list(
+                    "title", flat=True
+                )
+            ),
+            {"公開", "非公開"},
+        )
+
+    def test_backfill_on_migrate(self):
+        """post_migrate で既存の承認ルートから関係者を登録すること"""
+        backfill_routes()
+        self.assertTrue(self.restricted.is_visible_to(self.approver))
+        self.assertFalse(self.restricted.is_visible_to(self.other))
+
+    def test_admin_route_change_registers_participants(self):
+        """管理画面で承認者を追加すると関係者として登録されること"""
+        admin = User.objects.create_user(
+            email="rp-admin@example.com",
+            is_active=True,
+            is_staff=True,
+            is_superuser=True,
+        )
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse("admin:approvals_approver_add"),
+            {
+                "request": self.restricted.pk,
+                "user": self.other.pk,
+                "order": 2,
+                "status": Approver.STATUS_PENDING,
+            },
+        )
+        self.assertRedirects(
+            response, reverse("admin:approvals_approver_changelist")
+        )
+        self.assertTrue(self.restricted.is_visible_to(self.other))
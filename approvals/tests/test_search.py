@@ -0,0 +1,157 @@
+from datetime import date
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from approvals.models import Request, RequestSearchDocument
+from approvals.models.types import LocalBusinessTripRequest, SimpleRequest
+from approvals.search import (
+    SQLiteFTS5Backend,
+    get_backend,
+    query_tokens,
+    search_requests,
+    setup_search_backend,
+    tokenize,
+)
+
+User = get_user_model()
+
+
+class TokenizeTest(SimpleTestCase):
+    """
+    n-gram トークン分割のテスト。
+    """
+
+    def test_tokenize(self):
+        # 全角英数字は半角・小文字に正規化される
+        self.assertEqual(
+            tokenize("出張申請 ＡＢ"), ["出張", "張申", "申請", "ab"]
+        )
+        self.assertEqual(tokenize("X"), ["x"])
+
+    def test_query_tokens(self):
+        self.assertEqual(query_tokens("申請 申請"), ["申請"])
+        # 1文字の検索語はインデックスを使わない
+        self.assertIsNone(query_tokens("出"))
+        self.assertIsNone(query_tokens("  "))
+
+
+class RequestSearchTest(TestCase):
+    """
+    全文検索のテスト。
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="search@example.com")
+        self.simple = SimpleRequest.objects.create(
+            request_number="REQ-S-202601-0001",
+            title="備品購入のお願い",
+            applicant=self.user,
+            content="ノートパソコンを購入したい",
+        )
+        self.trip = LocalBusinessTripRequest.objects.create(
+            request_number="REQ-L-202601-0001",
+            title="打ち合わせ",
+            applicant=self.user,
+            trip_date=date(2026, 1, 1),
+            destination="横浜支店",
+        )
+
+    def search(self, query):
+        return list(
+            search_requests(Request.objects.all(), query)
+            .order_by("-search_rank")
+            .values_list("request_number", flat=True)
+        )
+
+    @skipUnless(connection.vendor == "sqlite", "SQLite only")
+    def test_fts5_backend_is_used(self):
+        """マイグレーション時に FTS5 のインデックスが作成されていること"""
+        self.assertIsInstance(get_backend(), SQLiteFTS5Backend)
+
+    @skipUnless(connection.vendor == "sqlite", "SQLite only")
+    def test_missing_triggers_are_recreated(self):
+        """テーブルの作り直しで消えたトリガーを post_migrate で作成すること"""
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER approvals_request_fts_au")
+        self.trip.destination = "川崎工場"
+        self.trip.save()
+        # トリガーがないため FTS5 のインデックスは更新されない
+        self.assertEqual(self.search("川崎"), [])
+
+        with self.assertLogs("approvals.search", level="WARNING"):
+            setup_search_backend()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                "AND name = 'approvals_request_fts_au'"
+            )
+            self.assertIsNotNone(cursor.fetchone())
+        # 再構築でトリガーがなかった間の変更も取り込まれる
+        self.assertEqual(self.search("川崎"), ["REQ-L-202601-0001"])
+        self.assertEqual(self.search("横浜"), [])
+
+    @skipUnless(connection.vendor == "sqlite", "SQLite only")
+    def test_outdated_fts_table_is_recreated(self):
+        """content_rowid の異なる既存の FTS5 テーブルを作り直すこと"""
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TABLE approvals_request_fts")
+            cursor.execute(
+                "CREATE VIRTUAL TABLE approvals_request_fts USING fts5("
+                "tokens, content='approvals_requestsearchdocument', "
+                "content_rowid='rowid')"
+            )
+
+        with self.assertLogs("approvals.search", level="WARNING"):
+            setup_search_backend()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' "
+                "AND name = 'approvals_request_fts'"
+            )
+            self.assertIn("content_rowid='id'", cursor.fetchone()[0])
+        self.assertEqual(self.search("横浜"), ["REQ-L-202601-0001"])
+
+        # 定義が同じなら作り直さない
+        with self.assertNoLogs("approvals.search", level="WARNING"):
+            setup_search_backend()
+
+    def test_document_is_created_on_save(self):
+        doc = RequestSearchDocument.objects.get(request=self.trip)
+        self.assertIn("横浜支店", doc.content)
+        self.assertIn("req-l-202601-0001", doc.content)
+
+    def test_search_type_specific_fields(self):
+        """子モデル固有の項目・部分文字列で検索できること"""
+        self.assertEqual(self.search("パソコン"), ["REQ-S-202601-0001"])
+        self.assertEqual(self.search("横浜"), ["REQ-L-202601-0001"])
+        self.assertEqual(self.search("S-202601"), ["REQ-S-202601-0001"])
+        self.assertEqual(self.search("存在しない"), [])
+
+    def test_single_character_falls_back(self):
+        self.assertEqual(self.search("浜"), ["REQ-L-202601-0001"])
+
+    def test_document_is_updated_on_save(self):
+        self.trip.destination = "川崎工場"
+        self.trip.save()
+        self.assertEqual(self.search("横浜"), [])
+        self.assertEqual(self.search("川崎"), ["REQ-L-202601-0001"])
+
+        # 検索対象外のフィールドのみの更新ではドキュメントを更新しない
+        self.trip.status = Request.STATUS_PENDING
+        self.trip.save(update_fields=["status"])
+        self.assertEqual(self.search("川崎"), ["REQ-L-202601-0001"])
+
+    def test_ranking(self):
+        """一致する回数の多い申請が上位になること"""
+        SimpleRequest.objects.create(
+            request_number="REQ-S-202601-0002",
+            title="購入",
+            applicant=self.user,
+            content="購入 購入 購入",
+        )
+        self.assertEqual(
+            self.search("購入"), ["REQ-S-202601-0002", "REQ-S-202601-0001"]
+        )
@@ -0,0 +1,134 @@
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import TestCase, override_settings
+
+from approvals import emails
+from approvals.models import Approver, Request
+from approvals.models.types import SimpleRequest
+from approvals.recipients import RecipientResolver
+from approvals.services import NotificationService
+
+User = get_user_model()
+
+
+class RecipientResolverTest(TestCase):
+    """
+    通知先の決定のテスト。
+    """
+
+    def setUp(self):
+        self.applicant = User.objects.create_user(email="nr@example.com")
+        self.approvers = [
+            User.objects.create_user(email=f"nr-{i}@example.com")
+            for i in range(1, 4)
+        ]
+        self.req = SimpleRequest.objects.create(
+            request_number="REQ-NR-1",
+            title="通知先",
+            applicant=self.applicant,
+            status=Request.STATUS_PENDING,
+            current_step=2,
+            content="test",
+        )
+        for order, (user, status) in enumerate(
+            [
+                (self.approvers[0], Approver.STATUS_APPROVED),
+                (self.approvers[1], Approver.STATUS_PENDING),
+                (self.approvers[2], Approver.STATUS_PENDING),
+            ],
+            start=1,
+        ):
+            Approver.objects.create(
+                request=self.req, user=user, order=order, status=status
+            )
+        # 申請者は取得済みの状態にする
+        self.req = SimpleRequest.objects.select_related("applicant").get(
+            pk=self.req.pk
+        )
+
+    @staticmethod
+    def emails(users):
+        return [user.email for user in users]
+
+    def test_recipients_per_event(self):
+        """イベントごとの To / Cc を1クエリで求めること"""
+        first, second, third = self.approvers
+        resolver = RecipientResolver(self.req)
+        with self.assertNumQueries(1):
+            to, cc = resolver.for_remanded(second)
+            self.assertEqual(to, [self.applicant])
+            self.assertEqual(cc, [second, first])
+
+            self.assertEqual(resolver.for_withdrawn(), ([second], [first]))
+            self.assertEqual(
+                resolver.for_proxy_remanded(),
+                ([self.applicant], [first, second]),
+            )
+            self.assertEqual(
+                resolver.for_approved(),
+                ([self.applicant], [first, second, third]),
+            )
+
+    def test_withdrawn_without_current_approver(self):
+        """現在の承認者がいない場合は承認済みの承認者が To になること"""
+        self.req.current_step = None
+        self.assertEqual(
+            RecipientResolver(self.req).for_withdrawn(),
+            ([self.approvers[0]], []),
+        )
+
+    def test_prefetched_route_is_reused(self):
+        """承認ルートが prefetch 済みの場合はクエリを発行しないこと"""
+        req = (
+            Request.objects.select_related("applicant")
+            .prefetch_related("approvers__user")
+            .get(pk=self.req.pk)
+        )
+        with self.assertNumQueries(0):
+            to, cc = RecipientResolver(req).for_approved()
+        self.assertEqual(self.emails(cc), self.emails(self.approvers))
+
+    def test_send_rejected_uses_one_query(self):
+        """却下通知のクエリが承認者数によらず1回であること"""
+        with self.assertNumQueries(1):
+            NotificationService.send_rejected(
+                self.req, self.approvers[1], "理由"
+            )
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["nr@example.com"])
+        self.assertEqual(
+            mail.outbox[0].cc, ["nr-2@example.com", "nr-1@example.com"]
+        )
+
+
+class EmailRenderingTest(TestCase):
+    """
+    通知メールの件名・本文の組み立てのテスト。
+    """
+
+    def test_render_email(self):
+        applicant = User(email="er@example.com")
+        req = SimpleRequest(
+            request_number="REQ-ER-1", title="件名テスト", applicant=applicant
+        )
+        subject, body = emails.render_email(
+            "approved", emails.request_context(req, "http://testserver/x")
+        )
+        self.assertEqual(subject, "[ポポン] 承認完了: 件名テスト")
+        self.assertIn("REQ-ER-1", body)
+        self.assertIn("http://testserver/x", body)
+
+        # 設定が変わった場合はキャッシュした件名を使わない
+        with override_settings(PROJECT_NAME="テスト"):
+            subject, _ = emails.render_email(
+                "approved", emails.request_context(req, "")
+            )
+        self.assertEqual(subject, "[テスト] 承認完了: 件名テスト")
+
+        # プロジェクト名・件名に { } が含まれていても組み立てられること
+        req.title = "{title} の件"
+        with override_settings(PROJECT_NAME="{ポポン}"):
+            subject, _ = emails.render_email(
+                "approved", emails.request_context(req, "")
+            )
+        self.assertEqual(subject, "[{ポポン}] 承認完了: {title} の件")
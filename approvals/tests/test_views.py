@@ -6,7 +6,7 @@ from django.core import mail
 from django.test import TestCase
 from django.urls import reverse
 
-from approvals.models import Approver, Request
+from approvals.models import Approver, Request, RequestParticipant
 from approvals.models.types import LocalBusinessTripRequest, SimpleRequest
 
 User = get_user_model()
@@ -107,6 +107,19 @@ class ApprovalWorkflowTest(TestCase):
         }
         self.client.post(url, data)
 
+        # 最初の承認者が現在の承認者になること
+        req = Request.objects.get(title="メール確認用")
+        self.assertEqual(req.current_approver, self.approver1)
+
+        # 申請者・承認者が関係者として登録されること
+        self.assertEqual(
+            set(req.participants.values_list("user", "role")),
+            {
+                (self.applicant.pk, RequestParticipant.ROLE_APPLICANT),
+                (self.approver1.pk, RequestParticipant.ROLE_APPROVER),
+            },
+        )
+
         # メール送信確認
         self.assertEqual(len(mail.outbox), 1)
         self.assertIn(f"[{settings.PROJECT_NAME}]", mail.outbox[0].subject)
@@ -222,6 +235,43 @@ class ApprovalWorkflowTest(TestCase):
         self.assertTrue(response.context["permission_denied"])
         self.assertContains(response, "閲覧権限がありません")
 
+    def test_detail_flags_use_prefetched_data(self):
+        """権限の判定で追加のクエリが発生せず、クエリ数が一定であること"""
+        req = SimpleRequest.objects.create(
+            title="承認済みの秘密の申請",
+            applicant=self.applicant,
+            is_restricted=True,
+            status=Request.STATUS_APPROVED,
+            request_number="REQ-SEC-APPROVED",
+        )
+        Approver.objects.create(
+            request=req,
+            user=self.approver1,
+            order=1,
+            status=Approver.STATUS_APPROVED,
+        )
+        RequestParticipant.record(req, [self.approver1])
+        url = reverse("approvals:detail", kwargs={"pk": req.id})
+
+        expected = [
+            (self.approver1, True, False),
+            (self.approver2, False, True),
+            (self.staff, False, False),
+        ]
+        for user, can_reject, denied in expected:
+            with self.subTest(user=user.email):
+                self.client.force_login(user)
+                # 親テーブル・子テーブル・承認ルート・履歴・関係者
+                # + セッション・ログインユーザー
+                with self.assertNumQueries(7):
+                    response = self.client.get(url)
+                self.assertEqual(
+                    response.context["can_reject_after_approval"], can_reject
+                )
+                self.assertEqual(
+                    response.context.get("permission_denied", False), denied
+                )
+
     def test_approve_action_workflow(self):
         """承認ワークフロー（中間承認 -> 最終承認）のテスト"""
         # 申請作成（2段階承認）
@@ -230,6 +280,7 @@ class ApprovalWorkflowTest(TestCase):
             applicant=self.applicant,
             status=Request.STATUS_PENDING,
             request_number="REQ-MULTI",
+            current_approver=self.approver1,
         )
         Approver.objects.create(request=req, user=self.approver1, order=1)
         Approver.objects.create(request=req, user=self.approver2, order=2)
@@ -241,6 +292,7 @@ class ApprovalWorkflowTest(TestCase):
 
         req.refresh_from_db()
         self.assertEqual(req.current_step, 2)
+        self.assertEqual(req.current_approver, self.approver2)
         self.assertEqual(req.status, Request.STATUS_PENDING)
 
         # メール確認（次の承認者へ）
@@ -252,6 +304,7 @@ class ApprovalWorkflowTest(TestCase):
 
         req.refresh_from_db()
         self.assertEqual(req.status, Request.STATUS_APPROVED)  # 完了
+        self.assertIsNone(req.current_approver)
 
         # メール確認（完了通知：申請者 + 全承認者に飛ぶ）
         self.assertTrue(any("承認完了" in m.subject for m in mail.outbox))
@@ -263,6 +316,7 @@ class ApprovalWorkflowTest(TestCase):
             applicant=self.applicant,
             status=Request.STATUS_PENDING,
             request_number="REQ-REM",
+            current_approver=self.approver1,
         )
         Approver.objects.create(request=req, user=self.approver1, order=1)
 
@@ -287,6 +341,7 @@ class ApprovalWorkflowTest(TestCase):
 
         req.refresh_from_db()
         self.assertEqual(req.status, Request.STATUS_REMANDED)
+        self.assertIsNone(req.current_approver)
 
         # Approverの状態確認
         approver = Approver.objects.get(request=req, user=self.approver1)
@@ -332,16 +387,79 @@ class ApprovalWorkflowTest(TestCase):
         req.refresh_from_db()
         self.assertEqual(req.status, Request.STATUS_PENDING)
         self.assertEqual(req.current_step, 1)
+        self.assertEqual(req.current_approver, self.approver1)
+
+        # 同じステップ・同じ承認者のレコードは再利用され、Pendingに戻ること
+        app_rec.refresh_from_db()
+        self.assertEqual(app_rec.status, Approver.STATUS_PENDING)
+        self.assertIsNone(app_rec.processed_at)
+        self.assertEqual(req.approvers.count(), 1)
+
+    def test_resubmit_with_route_change(self):
+        """承認ルートを変更して再申請するテスト（差分更新）"""
+        req = SimpleRequest.objects.create(
+            title="ルート変更",
+            applicant=self.applicant,
+            status=Request.STATUS_REMANDED,
+            request_number="REQ-RESUB-ROUTE",
+            current_step=2,
+        )
+        step1 = Approver.objects.create(
+            request=req,
+            user=self.approver1,
+            order=1,
+            status=Approver.STATUS_APPROVED,
+            comment="OK",
+        )
+        step2 = Approver.objects.create(
+            request=req,
+            user=self.approver2,
+            order=2,
+            status=Approver.STATUS_REMANDED,
+            comment="NG",
+        )
+        step3 = Approver.objects.create(request=req, user=self.staff, order=3)
+
+        self.client.force_login(self.applicant)
+        update_url = reverse("approvals:update", kwargs={"pk": req.id})
+
+        # 1: approver1 のまま, 2: staff に差し替え, 3: 削除
+        data = {
+            "title": "ルート変更",
+            "content": "修正内容",
+            "approvers-TOTAL_FORMS": "3",
+            "approvers-INITIAL_FORMS": "3",
+            "approvers-MIN_NUM_FORMS": "0",
+            "approvers-MAX_NUM_FORMS": "1000",
+            "approvers-0-id": str(step1.id),
+            "approvers-0-user": str(self.approver1.id),
+            "approvers-0-order": "1",
+            "approvers-1-id": str(step2.id),
+            "approvers-1-user": str(self.staff.id),
+            "approvers-1-order": "2",
+            "approvers-2-id": str(step3.id),
+            "approvers-2-user": "",
+            "approvers-2-order": "3",
+        }
+        response = self.client.post(update_url, data)
+        self.assertEqual(response.status_code, 302)
 
-        # 古いレコードは削除されているはずなので、refreshしようとするとエラーになることを確認
-        with self.assertRaises(Approver.DoesNotExist):
-            app_rec.refresh_from_db()
+        route = list(req.approvers.order_by("order"))
+        self.assertEqual(
+            [(a.order, a.user) for a in route],
+            [(1, self.approver1), (2, self.staff)],
+        )
+        self.assertTrue(
+            all(a.status == Approver.STATUS_PENDING for a in route)
+        )
+        self.assertEqual(route[0].comment, "")
+        # 既存レコードは更新され、余ったステップは削除される
+        self.assertEqual(route[0].id, step1.id)
+        self.assertEqual(route[1].id, step2.id)
+        self.assertFalse(Approver.objects.filter(pk=step3.pk).exists())
 
-        # 新しいレコードが作成され、ステータスがPendingになっていることを確認
-        new_approver = Approver.objects.get(request=req, user=self.approver1)
-        self.assertEqual(new_approver.status, Approver.STATUS_PENDING)
-        # IDが変わっていることも確認（再作成の証拠）
-        self.assertNotEqual(new_approver.id, app_rec.id)
+        # 最初の承認者へ再承認依頼が送られる
+        self.assertIn(self.approver1.email, mail.outbox[-1].to)
 
     def test_approve_already_withdrawn(self):
         """取り下げ済みの申請に対する承認試行のテスト"""
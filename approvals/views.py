@@ -3,25 +3,23 @@ import logging
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.db import transaction
+from django.db.models import Prefetch
 from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect
-from django.template import TemplateDoesNotExist
-from django.template.loader import get_template
 from django.urls import reverse_lazy
 from django.utils import timezone
 from django.views import View
 from django.views.generic import CreateView, DetailView, UpdateView
 
-from .forms import (
-    ActionForm,
-    ApproverFormSet,
-    create_request_form_class,
-)
+from .forms import ActionForm, ApproverFormSet
 from .models import (
     ApprovalLog,
     Approver,
     Request,
+    RequestNumberSequence,
+    RequestParticipant,
 )
+from .registry import registry
 from .services import NotificationService
 
 logger = logging.getLogger(__name__)
@@ -30,14 +28,76 @@ logger = logging.getLogger(__name__)
 def save_approvers(request_obj, approvers_list):
     """
     承認者リストを保存するヘルパー関数。
+    全ステップ分の Approver をまとめて1回の bulk_create で登録する。
+    """
+    Approver.objects.bulk_create(
+        [
+            Approver(
+                request=request_obj,
+                user=approver_user,
+                order=i,
+                status=Approver.STATUS_PENDING,
+            )
+            for i, approver_user in enumerate(approvers_list, start=1)
+        ]
+    )
+
+
+def sync_approvers(request_obj, approvers_list):
     """
+    再申請時に承認ルートを差分更新するヘルパー関数。
+    既存ルートとステップ(order)単位で比較し、変更のあったステップのみ
+    更新・追加・削除する（未変更のステップには書き込まない）。
+    """
+    existing = {
+        a.order: a for a in Approver.objects.filter(request=request_obj)
+    }
+    now = timezone.now()
+    to_update = []
+    to_create = []
+
     for i, approver_user in enumerate(approvers_list, start=1):
-        Approver.objects.create(
-            request=request_obj,
-            user=approver_user,
-            order=i,
-            status=Approver.STATUS_PENDING,
+        approver = existing.pop(i, None)
+        if approver is None:
+            to_create.append(
+                Approver(
+                    request=request_obj,
+                    user=approver_user,
+                    order=i,
+                    status=Approver.STATUS_PENDING,
+                )
+            )
+            continue
+
+        # 同じ承認者で未処理のままなら何もしない
+        if (
+            approver.user_id == approver_user.pk
+            and approver.status == Approver.STATUS_PENDING
+            and not approver.comment
+            and approver.processed_at is None
+        ):
+            continue
+
+        # 承認者の差し替え、または判定結果のリセット
+        approver.user = approver_user
+        approver.status = Approver.STATUS_PENDING
+        approver.comment = ""
+        approver.processed_at = None
+        approver.updated_at = now  # bulk_update では auto_now が効かない
+        to_update.append(approver)
+
+    # 新しいルートより後ろのステップは削除
+    if existing:
+        Approver.objects.filter(
+            pk__in=[a.pk for a in existing.values()]
+        ).delete()
+    if to_update:
+        Approver.objects.bulk_update(
+            to_update,
+            ["user", "status", "comment", "processed_at", "updated_at"],
         )
+    if to_create:
+        Approver.objects.bulk_create(to_create)
 
 
 def validate_approvers(request, approvers_list):
@@ -100,23 +160,12 @@ class BaseRequestCreateView(LoginRequiredMixin, CreateView):
 
         # prefixの取得
         prefix_val = getattr(self, "request_prefix", "REQ")
-        prefix = f"{prefix_val}-{yyyymm}"
-
-        # その月の最新の申請番号を取得してロック
-        qs = Request.objects.select_for_update()
-        latest_request = (
-            qs.filter(request_number__startswith=prefix)
-            .order_by("-request_number")
-            .first()
-        )
 
-        if latest_request:
-            last_num = int(latest_request.request_number.split("-")[-1])
-            new_num = last_num + 1
-        else:
-            new_num = 1
+        # 採番テーブルから (prefix, 年月) 単位で次の連番を取得
+        # （該当行のみロックされ、他の種別の採番はブロックしない）
+        new_num = RequestNumberSequence.next_value(prefix_val, yyyymm)
 
-        return f"{prefix}-{new_num:04d}"
+        return f"{prefix_val}-{yyyymm}-{new_num:04d}"
 
     def form_valid(self, form):
         context = self.get_context_data()
@@ -146,11 +195,13 @@ class BaseRequestCreateView(LoginRequiredMixin, CreateView):
                 self.object.request_number = request_number
                 self.object.applicant = self.request.user
                 self.object.status = Request.STATUS_PENDING
+                self.object.current_approver = approvers[0]
                 self.object.submitted_at = timezone.now()
                 self.object.save()
 
                 # 3. 承認者保存
                 save_approvers(self.object, approvers)
+                RequestParticipant.record(self.object, approvers)
 
                 # 4. ログ記録
                 ApprovalLog.objects.create(
@@ -196,8 +247,8 @@ class RequestCreateView(BaseRequestCreateView):
         return super().dispatch(request, *args, **kwargs)
 
     def get_form_class(self):
-        # 動的にフォームクラスを生成
-        return create_request_form_class(self.model_class)
+        # 申請タイプのフォームクラス（定義がなければ動的に生成）
+        return registry.get_form_class(self.model_class)
 
     @property
     def request_prefix(self):
@@ -211,10 +262,14 @@ class RequestCopyView(RequestCreateView):
     """
 
     def dispatch(self, request, *args, **kwargs):
-        # コピー元の申請を取得
-        self.original_request = get_object_or_404(Request, pk=kwargs.get("pk"))
-        # 子モデルのインスタンスを取得（重要：これがないとSimpleRequest等の固有フィールドが取れない）
-        self.original_request = self.original_request.get_real_instance()
+        # コピー元の申請を子モデルのインスタンスとして取得
+        # （重要：これがないとSimpleRequest等の固有フィールドが取れない）
+        try:
+            self.original_request = Request.objects.get_real(
+                pk=kwargs.get("pk")
+            )
+        except Request.DoesNotExist:
+            raise Http404("申請が見つかりません。")
 
         # スラッグを取得
         slug = self.original_request.get_slug()
@@ -234,6 +289,7 @@ class RequestCopyView(RequestCreateView):
             "applicant",
             "status",
             "current_step",
+            "current_approver",
             "submitted_at",
             "created_at",
             "updated_at",
@@ -260,7 +316,23 @@ class RequestCopyView(RequestCreateView):
         return context
 
 
-class RequestUpdateView(LoginRequiredMixin, UpdateView):
+class RealInstanceMixin:
+    """
+    SingleObjectMixin の get_object を、子モデルのインスタンスを返すように
+    置き換える Mixin。
+    親テーブルと子テーブルをそれぞれ1回ずつ参照して取得する。
+    """
+
+    def get_object(self, queryset=None):
+        if queryset is None:
+            queryset = self.get_queryset()
+        try:
+            return queryset.get_real(pk=self.kwargs.get(self.pk_url_kwarg))
+        except Request.DoesNotExist:
+            raise Http404("申請が見つかりません。")
+
+
+class RequestUpdateView(LoginRequiredMixin, RealInstanceMixin, UpdateView):
     """
     再申請ビュー。
     """
@@ -269,18 +341,11 @@ class RequestUpdateView(LoginRequiredMixin, UpdateView):
     template_name = "approvals/request_form.html"
     success_url = reverse_lazy("portal:index")
 
-    def get_object(self, queryset=None):
-        """
-        Requestオブジェクトを取得し、子モデルのインスタンスに変換して返す。
-        """
-        obj = super().get_object(queryset)
-        return obj.get_real_instance()
-
     def get_form_class(self):
         """
-        オブジェクトの型に応じてフォームクラスを動的に生成して返す。
+        オブジェクトの型に応じたフォームクラスを返す。
         """
-        return create_request_form_class(self.object.__class__)
+        return registry.get_form_class(self.object.__class__)
 
     def get_queryset(self):
         # 申請者本人のもので、差戻し状態のものに限る
@@ -336,15 +401,17 @@ class RequestUpdateView(LoginRequiredMixin, UpdateView):
                 # 親モデル(Request)のフィールドも更新
                 updated_object.status = Request.STATUS_PENDING
                 updated_object.current_step = 1
+                updated_object.current_approver = approvers[0]
                 updated_object.submitted_at = timezone.now()
                 updated_object.save()
 
                 # self.object を更新後のものに置き換え
                 self.object = updated_object
 
-                # 承認ルートの再構築 (全削除 -> 再作成)
-                self.object.approvers.all().delete()
-                save_approvers(self.object, approvers)
+                # 承認ルートの再構築 (変更のあったステップのみ差分更新)
+                sync_approvers(self.object, approvers)
+                # 関係者の追加 (ルートから外れた承認者も閲覧可能なまま残す)
+                RequestParticipant.record(self.object, approvers)
 
                 # ログ記録
                 ApprovalLog.objects.create(
@@ -355,12 +422,10 @@ class RequestUpdateView(LoginRequiredMixin, UpdateView):
                     comment="再申請",
                 )
 
-                # メール通知
-                first_approver = self.object.approvers.filter(order=1).first()
-                if first_approver:
-                    NotificationService.send_resubmitted(
-                        self.object, first_approver.user, self.request
-                    )
+                # メール通知（新しいルートの最初の承認者へ）
+                NotificationService.send_resubmitted(
+                    self.object, approvers[0], self.request
+                )
 
             messages.success(
                 self.request,
@@ -374,7 +439,7 @@ class RequestUpdateView(LoginRequiredMixin, UpdateView):
             return self.render_to_response(context)
 
 
-class RequestDetailView(DetailView):
+class RequestDetailView(RealInstanceMixin, DetailView):
     """
     申請詳細画面。
     """
@@ -384,62 +449,67 @@ class RequestDetailView(DetailView):
     context_object_name = "req"
 
     def get_queryset(self):
+        # 子モデル (申請者を結合)・承認ルート・履歴・関係者を
+        # それぞれ1クエリで取得し、表示と権限の判定はメモリ上で行う
         return (
             super()
             .get_queryset()
             .select_related("applicant")
-            .prefetch_related("approvers__user", "logs__actor")
+            .prefetch_related(
+                Prefetch(
+                    "approvers",
+                    queryset=Approver.objects.select_related("user"),
+                ),
+                Prefetch(
+                    "logs",
+                    queryset=ApprovalLog.objects.select_related("actor"),
+                ),
+                "participants",
+            )
         )
 
-    def get_object(self, queryset=None):
-        """
-        表示用に子モデルのインスタンスを取得して返す。
-        """
-        obj = super().get_object(queryset)
-        return obj.get_real_instance()
-
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         req = self.object
         user = self.request.user
 
-        # テンプレートの存在確認とフォールバック
-        template_name = req.detail_template_name
-        try:
-            get_template(template_name)
-            context["partial_template"] = template_name
-        except TemplateDoesNotExist:
-            context["partial_template"] = (
-                "approvals/partials/detail_default.html"
-            )
+        # 申請タイプの部分テンプレート（なければ既定のテンプレート）
+        context["partial_template"] = registry.get_detail_template(type(req))
+
+        # 承認ルートはプリフェッチ済みのため、以降の判定でクエリは発生しない
+        my_approvers = (
+            [a for a in req.approvers.all() if a.user_id == user.pk]
+            if user.is_authenticated
+            else []
+        )
 
         # 現在のユーザーが承認すべき状態か判定
-        can_approve = False
         current_approver = None
+        if (
+            req.status == Request.STATUS_PENDING
+            and req.current_approver_id == user.pk
+        ):
+            current_approver = next(
+                (
+                    a
+                    for a in my_approvers
+                    if a.order == req.current_step
+                    and a.status == Approver.STATUS_PENDING
+                ),
+                None,
+            )
 
-        is_pending = req.status == Request.STATUS_PENDING
-        if user.is_authenticated and is_pending:
-            current_approver = req.approvers.filter(
-                order=req.current_step,
-                user=user,
-                status=Approver.STATUS_PENDING,
-            ).first()
-            if current_approver:
-                can_approve = True
-
-        context["can_approve"] = can_approve
+        context["can_approve"] = current_approver is not None
         context["current_approver"] = current_approver
         context["action_form"] = ActionForm()
 
         # 事後却下可能フラグ
-        can_reject_after_approval = False
-        if user.is_authenticated and req.status == Request.STATUS_APPROVED:
-            if req.approvers.filter(user=user).exists():
-                can_reject_after_approval = True
-        context["can_reject_after_approval"] = can_reject_after_approval
+        context["can_reject_after_approval"] = (
+            req.status == Request.STATUS_APPROVED and bool(my_approvers)
+        )
 
         # 申請者向けアクションフラグ
-        if user.is_authenticated and req.applicant == user:
+        if user.is_authenticated and req.applicant_id == user.pk:
             context["can_withdraw"] = req.status in [
                 Request.STATUS_PENDING,
                 Request.STATUS_APPROVED,
@@ -459,17 +529,9 @@ class RequestDetailView(DetailView):
         else:
             context["can_proxy_remand"] = False
 
-        # 閲覧制限チェック
-        if req.is_restricted:
-            has_permission = False
-            if user.is_authenticated:
-                related_users = {a.user.id for a in req.approvers.all()}
-                related_users.add(req.applicant.id)
-                if user.id in related_users or user.is_staff:
-                    has_permission = True
-
-            if not has_permission:
-                context["permission_denied"] = True
+        # 閲覧制限チェック (プリフェッチ済みの関係者を参照)
+        if not (user.is_staff or req.is_visible_to(user)):
+            context["permission_denied"] = True
 
         return context
 
@@ -516,15 +578,8 @@ class RequestActionView(LoginRequiredMixin, View):
                             .first()
                         )
                     else:
-                        approver = (
-                            Approver.objects.select_for_update()
-                            .filter(
-                                request=req,
-                                order=req.current_step,
-                                user=request.user,
-                                status=Approver.STATUS_PENDING,
-                            )
-                            .first()
+                        approver, _ = self.get_step_approvers(
+                            req, request.user
                         )
 
                 else:
@@ -535,15 +590,8 @@ class RequestActionView(LoginRequiredMixin, View):
                         )
                         return redirect("approvals:detail", pk=pk)
 
-                    approver = (
-                        Approver.objects.select_for_update()
-                        .filter(
-                            request=req,
-                            order=req.current_step,
-                            user=request.user,
-                            status=Approver.STATUS_PENDING,
-                        )
-                        .first()
+                    approver, next_approver = self.get_step_approvers(
+                        req, request.user
                     )
 
                 if not approver:
@@ -561,19 +609,16 @@ class RequestActionView(LoginRequiredMixin, View):
                     approver.status = Approver.STATUS_APPROVED
                     approver.save()
 
-                    next_step = req.current_step + 1
-                    next_approver = req.approvers.filter(
-                        order=next_step
-                    ).first()
-
                     if next_approver:
-                        req.current_step = next_step
+                        req.current_step = next_approver.order
+                        req.current_approver_id = next_approver.user_id
                         req.save()
                         NotificationService.send_approval_request(
                             req, next_approver.user, request
                         )
                     else:
                         req.status = Request.STATUS_APPROVED
+                        req.current_approver = None
                         req.save()
                         NotificationService.send_approved(req, request)
 
@@ -594,6 +639,7 @@ class RequestActionView(LoginRequiredMixin, View):
                     approver.save()
 
                     req.status = Request.STATUS_REMANDED
+                    req.current_approver = None
                     req.save()
 
                     NotificationService.send_remanded(
@@ -617,6 +663,7 @@ class RequestActionView(LoginRequiredMixin, View):
                     approver.save()
 
                     req.status = Request.STATUS_REJECTED
+                    req.current_approver = None
                     req.save()
 
                     NotificationService.send_rejected(
@@ -641,6 +688,25 @@ class RequestActionView(LoginRequiredMixin, View):
 
         return redirect("approvals:detail", pk=pk)
 
+    def get_step_approvers(self, req, user):
+        """
+        現在のステップ（操作者本人かつ未処理のもの）と次のステップの承認者を
+        1回のクエリでロックして取得する。該当しない場合は None を返す。
+        """
+        current = next_ = None
+        for approver in Approver.objects.select_for_update().filter(
+            request=req, order__in=[req.current_step, req.current_step + 1]
+        ):
+            if approver.order == req.current_step:
+                if (
+                    approver.user_id == user.pk
+                    and approver.status == Approver.STATUS_PENDING
+                ):
+                    current = approver
+            else:
+                next_ = approver
+        return current, next_
+
     def log_action(self, req, actor, action, step, comment):
         ApprovalLog.objects.create(
             request=req, actor=actor, action=action, step=step, comment=comment
@@ -676,6 +742,7 @@ class RequestWithdrawView(LoginRequiredMixin, View):
                 is_remanded_withdraw = req.status == Request.STATUS_REMANDED
 
                 req.status = Request.STATUS_WITHDRAWN
+                req.current_approver = None
                 req.save()
 
                 if not is_remanded_withdraw:
@@ -733,6 +800,7 @@ class RequestProxyRemandView(LoginRequiredMixin, UserPassesTestMixin, View):
                     return redirect("approvals:detail", pk=pk)
 
                 req.status = Request.STATUS_REMANDED
+                req.current_approver = None
                 req.save()
 
                 if req.current_step:
@@ -73,6 +73,7 @@ AUTH_USER_MODEL = "accounts.User"
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "core.middleware.RequestMetricsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -170,6 +171,9 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Email settings for development
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 DEFAULT_FROM_EMAIL = "noreply@example.com"
+# True の場合、通知メールは送信待ちテーブルに登録し、
+# python manage.py send_queued_emails --loop で非同期に送信する
+NOTIFICATION_USE_OUTBOX = secrets.get("NOTIFICATION_USE_OUTBOX", False)
 #
 # EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 # EMAIL_HOST = 'smtp.gmail.com'
@@ -179,10 +183,72 @@ DEFAULT_FROM_EMAIL = "noreply@example.com"
 # EMAIL_HOST_PASSWORD = 'YOUR_APP_PASSWORD'
 
 SITE_ID = 1  # どのサイト設定を使うかを指定
+# サイトのURL (core.sites) をプロセス内でキャッシュする秒数
+SITE_URL_CACHE_TIMEOUT = 300
+
+# リクエストごとの計測 (core.middleware.RequestMetricsMiddleware)
+REQUEST_METRICS_ENABLED = secrets.get("REQUEST_METRICS_ENABLED", True)
+# Server-Timing ヘッダーを付けるか
+# (全てのクライアントにクエリ数・SQL時間を公開するため、開発・検証環境でのみ有効にする)
+REQUEST_METRICS_SERVER_TIMING = secrets.get(
+    "REQUEST_METRICS_SERVER_TIMING", False
+)
+# この時間 (ミリ秒) 以上かかったリクエストのクエリ一覧を記録する
+REQUEST_METRICS_SLOW_MS = secrets.get("REQUEST_METRICS_SLOW_MS", 1000)
+# 遅いリクエストのうちクエリ一覧を記録する割合 (0.0 - 1.0)
+REQUEST_METRICS_SLOW_SAMPLE_RATE = secrets.get(
+    "REQUEST_METRICS_SLOW_SAMPLE_RATE", 1.0
+)
+
+LOG_DIR = BASE_DIR / "log"
+LOG_DIR.mkdir(exist_ok=True)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+        },
+        "slow_requests": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": LOG_DIR / "slow_requests.log",
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 5,
+            "encoding": "utf-8",
+            "delay": True,
+        },
+    },
+    "loggers": {
+        # リクエストごとの計測値 (1リクエスト1行)
+        # REQUEST_METRICS_LOG_LEVEL = "INFO" (.secrets.toml) で出力する
+        "core.metrics": {
+            "handlers": ["console"],
+            "level": secrets.get("REQUEST_METRICS_LOG_LEVEL", "WARNING"),
+            "propagate": False,
+        },
+        # 遅いリクエストのクエリ一覧
+        "core.metrics.slow": {
+            "handlers": ["slow_requests"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
 
 # Portal Pagination Settings
 PORTAL_REQUESTS_PER_PAGE = 20
 PORTAL_NOTIFICATIONS_PER_PAGE = 5
+# 申請一覧のページネーション方式
+#   "offset": ページ番号方式（総件数・総ページ数を表示）
+#   "keyset": カーソル方式（深いページでも1ページ目と同じコスト）
+PORTAL_REQUESTS_PAGINATION = "offset"
+# keyset 方式で概算件数を表示するか
+PORTAL_REQUESTS_APPROXIMATE_COUNT = True
+# ポータルの部品（お知らせ・承認待ち・差戻し）をキャッシュする秒数 (0: 無効)
+# CACHES にプロセス間で共有するキャッシュ (Redis など) を設定した場合のみ有効
+# (既定の LocMemCache ではワーカーごとに内容が食い違うためキャッシュしない)
+PORTAL_CACHE_TIMEOUT = secrets.get("PORTAL_CACHE_TIMEOUT", 0)
 
 try:
     from .local_settings import *  # noqa
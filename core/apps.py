@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete, post_save
 
 
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        from django.contrib.sites.models import Site
+
+        from .sites import clear_site_url_cache
+
+        # サイトのドメインが変わったらキャッシュしたURLを破棄する
+        post_save.connect(clear_site_url_cache, sender=Site)
+        post_delete.connect(clear_site_url_cache, sender=Site)
+        setting_changed.connect(clear_site_url_cache)
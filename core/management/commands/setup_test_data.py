@@ -8,6 +8,7 @@ from approvals.models import (
     ApprovalLog,
     Approver,
     Request,
+    RequestParticipant,
 )
 from approvals.models.types import (
     LocalBusinessTripRequest,
@@ -431,6 +432,10 @@ class Command(BaseCommand):
                         comment=comment,
                     )
 
+        # 現在の承認者・関係者を承認ルートから設定
+        Request.objects.filter(pk=req.pk).sync_current_approvers()
+        RequestParticipant.record(req, [data[0] for data in route])
+
         # 最終的な取下ログなど
         if req.status == Request.STATUS_WITHDRAWN:
             ApprovalLog.objects.create(
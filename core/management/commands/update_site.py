@@ -2,6 +2,8 @@ from django.conf import settings
 from django.contrib.sites.models import Site
 from django.core.management.base import BaseCommand, CommandError
 
+from core.sites import clear_site_url_cache
+
 
 class Command(BaseCommand):
     help = (
@@ -51,6 +53,8 @@ class Command(BaseCommand):
             self.stdout.write(f"Updating site name to: {name}")
 
         site.save()
+        # 保存時のシグナルでも破棄されるが、明示的に破棄しておく
+        clear_site_url_cache()
 
         self.stdout.write(
             self.style.SUCCESS(
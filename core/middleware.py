@@ -0,0 +1,139 @@
+"""
+リクエストごとの計測ミドルウェア。
+
+クエリ数・SQL時間・応答処理の時間・全体の処理時間を計測し、
+Server-Timing ヘッダー (REQUEST_METRICS_SERVER_TIMING が有効な場合) と
+構造化ログ (core.metrics) に出力する。
+
+応答処理の時間 (response) は、ビューが TemplateResponse を返してから
+このミドルウェアに応答が戻るまでの時間で、TemplateResponse の遅延描画
+（描画中に評価されたクエリを含む）と、内側のミドルウェアの応答処理
+（セッションの保存など）を含む。render() で描画済みの応答を返すビューでは
+テンプレートの描画はビューの中で行われるため 0 になる。
+処理時間が REQUEST_METRICS_SLOW_MS を超えたリクエストは、
+REQUEST_METRICS_SLOW_SAMPLE_RATE の割合で実行したクエリの一覧を
+core.metrics.slow に出力する（LOGGING で log/slow_requests.log に書き出す）。
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+from typing import Any, Optional
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("core.metrics")
+slow_logger = logging.getLogger("core.metrics.slow")
+
+# 遅いリクエストのログに残すクエリの上限
+MAX_RECORDED_QUERIES = 500
+
+
+class RequestMetrics:
+    """1リクエスト分の計測値"""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.response_time = 0.0
+        self.response_started: Optional[float] = None
+        self.queries: list[dict[str, Any]] = []
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """connection.execute_wrapper に渡すフック"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.query_count += 1
+            self.sql_time += duration
+            if len(self.queries) < MAX_RECORDED_QUERIES:
+                self.queries.append(
+                    {
+                        "sql": sql,
+                        "alias": context["connection"].alias,
+                        "ms": round(duration * 1000, 3),
+                    }
+                )
+
+    def finish_response(self) -> None:
+        if self.response_started is not None:
+            self.response_time = time.perf_counter() - self.response_started
+            self.response_started = None
+
+    def as_dict(self, request, response) -> dict[str, Any]:
+        return {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "queries": self.query_count,
+            "db_ms": round(self.sql_time * 1000, 2),
+            "response_ms": round(self.response_time * 1000, 2),
+            "total_ms": round(self.total * 1000, 2),
+        }
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+
+class RequestMetricsMiddleware:
+    """
+    リクエストごとの計測ミドルウェア。
+    応答処理の時間は process_template_response の後（TemplateResponse の描画と
+    内側のミドルウェアの応答処理）にかかった時間（モジュールの説明を参照）。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REQUEST_METRICS_ENABLED:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        request._metrics = metrics
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(metrics.execute_wrapper)
+                )
+            response = self.get_response(request)
+        metrics.finish_response()
+
+        data = metrics.as_dict(request, response)
+        if settings.REQUEST_METRICS_SERVER_TIMING:
+            response["Server-Timing"] = (
+                f'db;dur={data["db_ms"]};desc="{data["queries"]} queries", '
+                f"resp;dur={data['response_ms']}, "
+                f"total;dur={data['total_ms']}"
+            )
+        logger.info(
+            " ".join(f"{key}={value}" for key, value in data.items()),
+            extra={"metrics": data},
+        )
+
+        if data["total_ms"] >= settings.REQUEST_METRICS_SLOW_MS and (
+            random.random() < settings.REQUEST_METRICS_SLOW_SAMPLE_RATE
+        ):
+            slow_logger.warning(
+                json.dumps(
+                    {**data, "query_list": metrics.queries},
+                    ensure_ascii=False,
+                )
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        # この直後に TemplateResponse が描画される
+        metrics = getattr(request, "_metrics", None)
+        if metrics is not None:
+            metrics.response_started = time.perf_counter()
+        return response
@@ -0,0 +1,68 @@
+"""
+サイトの絶対URL (スキーム + Site のドメイン) の解決。
+
+HttpRequest のない処理（管理コマンド・ワーカー）でもメール本文などに
+正しい絶対URLを埋め込めるようにする。
+解決したURLはプロセスごとに SITE_URL_CACHE_TIMEOUT 秒キャッシュし、
+メール1通ごとにデータベースを参照しないようにする。
+Site の保存・削除時（管理画面・update_site コマンド）にはキャッシュを破棄する
+（CoreConfig.ready で接続）。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Optional
+
+from django.conf import settings
+
+_lock = threading.Lock()
+_cached_url: Optional[str] = None
+_expires_at = 0.0
+
+# 設定が変わったらキャッシュを破棄する設定名
+CACHE_SETTINGS = {"SITE_ID", "SECURE_SSL_REDIRECT", "SITE_URL_CACHE_TIMEOUT"}
+
+
+def get_scheme() -> str:
+    return "https" if settings.SECURE_SSL_REDIRECT else "http"
+
+
+def get_site_url() -> str:
+    """現在のサイトのURL（例: https://example.com）を返す"""
+    global _cached_url, _expires_at
+
+    now = time.monotonic()
+    with _lock:
+        if _cached_url is not None and now < _expires_at:
+            return _cached_url
+
+    from django.contrib.sites.models import Site
+
+    # Siteフレームワークが設定されていない場合は例外を発生させる
+    url = f"{get_scheme()}://{Site.objects.get_current().domain}"
+    with _lock:
+        _cached_url = url
+        _expires_at = now + settings.SITE_URL_CACHE_TIMEOUT
+    return url
+
+
+def build_absolute_url(path: str) -> str:
+    """サイト内のパスを絶対URLにする"""
+    return f"{get_site_url()}{path}"
+
+
+def clear_site_url_cache(**kwargs) -> None:
+    """
+    キャッシュしたサイトのURLを破棄する
+    （Site の post_save / post_delete と setting_changed のハンドラ）。
+    """
+    global _cached_url, _expires_at
+
+    setting = kwargs.get("setting")
+    if setting is not None and setting not in CACHE_SETTINGS:
+        return
+    with _lock:
+        _cached_url = None
+        _expires_at = 0.0
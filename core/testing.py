@@ -0,0 +1,112 @@
+"""
+テスト用のクエリ数の上限（クエリバジェット）の検証。
+
+    with query_budget(10, label="portal:index"):
+        self.client.get(url)
+
+    @query_budget(5)
+    def test_xxx(self): ...
+
+上限を超えた場合は QueryBudgetExceeded (AssertionError) を送出する。
+環境変数 QUERY_BUDGET_REPORT にファイルパスを指定すると、
+テスト終了時に計測結果（ラベルごとのクエリ数・SQL合計時間・上限）を
+JSON で書き出す（推移の記録用）。
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import threading
+from contextlib import ContextDecorator
+from typing import Any, Optional
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+REPORT_ENV = "QUERY_BUDGET_REPORT"
+
+_results: list[dict[str, Any]] = []
+_lock = threading.Lock()
+_report_registered = False
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class query_budget(ContextDecorator):
+    """
+    ブロック内のクエリ数が max_queries 以下であることを検証する。
+    デコレータとしても使える（ラベルは関数名になる）。
+    """
+
+    def __init__(
+        self,
+        max_queries: int,
+        label: Optional[str] = None,
+        using: str = DEFAULT_DB_ALIAS,
+    ) -> None:
+        self.max_queries = max_queries
+        self.label = label
+        self.using = using
+        self.count = 0
+        self.sql_time = 0.0
+        self.queries: list[dict[str, Any]] = []
+
+    def __call__(self, func):
+        if self.label is None:
+            self.label = func.__qualname__
+        return super().__call__(func)
+
+    def __enter__(self) -> query_budget:
+        self._context = CaptureQueriesContext(connections[self.using])
+        self._context.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._context.__exit__(exc_type, exc_value, traceback)
+        self.queries = list(self._context.captured_queries)
+        self.count = len(self.queries)
+        self.sql_time = sum(float(q.get("time") or 0) for q in self.queries)
+        if exc_type is not None:
+            return
+
+        record(self.label or "", self.count, self.sql_time, self.max_queries)
+        if self.count > self.max_queries:
+            statements = "\n".join(
+                f"{i}. {q['sql']}" for i, q in enumerate(self.queries, 1)
+            )
+            raise QueryBudgetExceeded(
+                f"{self.label}: {self.count} queries executed, "
+                f"budget is {self.max_queries}\n{statements}"
+            )
+
+
+def record(label: str, count: int, sql_time: float, budget: int) -> None:
+    """計測結果を記録する（QUERY_BUDGET_REPORT 指定時は終了時に書き出す）"""
+    global _report_registered
+
+    path = os.environ.get(REPORT_ENV)
+    if not path:
+        return
+    with _lock:
+        _results.append(
+            {
+                "label": label,
+                "queries": count,
+                "sql_time_ms": round(sql_time * 1000, 3),
+                "budget": budget,
+            }
+        )
+        if not _report_registered:
+            atexit.register(write_report, path)
+            _report_registered = True
+
+
+def write_report(path: str) -> None:
+    with _lock:
+        results = list(_results)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"results": results}, f, ensure_ascii=False, indent=2)
@@ -1 +1,234 @@
-# No tests yet.
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import get_resolver, reverse
+
+from accounts.models import LoginToken
+from approvals.models import Request
+from core.sites import build_absolute_url, clear_site_url_cache
+from core.testing import QueryBudgetExceeded, query_budget
+from notification.models import Notification
+
+User = get_user_model()
+
+
+class SiteUrlTest(TestCase):
+    """
+    サイトの絶対URLの解決のテスト。
+    """
+
+    def setUp(self):
+        clear_site_url_cache()
+        Site.objects.clear_cache()
+        Site.objects.filter(pk=1).update(domain="popon.example.com")
+
+    def tearDown(self):
+        clear_site_url_cache()
+
+    def test_url_is_cached(self):
+        """2回目以降はデータベースを参照しないこと"""
+        with self.assertNumQueries(1):
+            url = build_absolute_url("/approvals/1/")
+        self.assertEqual(url, "http://popon.example.com/approvals/1/")
+        with self.assertNumQueries(0):
+            build_absolute_url("/")
+
+    @override_settings(SECURE_SSL_REDIRECT=True)
+    def test_scheme_follows_ssl_setting(self):
+        self.assertEqual(build_absolute_url("/"), "https://popon.example.com/")
+
+    def test_update_site_clears_cache(self):
+        """update_site でドメインを変更するとキャッシュが破棄されること"""
+        build_absolute_url("/")
+        call_command(
+            "update_site", domain="new.example.com", stdout=StringIO()
+        )
+        self.assertEqual(build_absolute_url("/"), "http://new.example.com/")
+
+
+class QueryBudgetTest(TestCase):
+    """
+    クエリバジェットのテスト。
+    """
+
+    def test_within_budget(self):
+        with query_budget(1) as budget:
+            User.objects.count()
+        self.assertEqual(budget.count, 1)
+
+    def test_exceeding_budget_fails(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget(1, label="two queries"):
+                User.objects.count()
+                User.objects.exists()
+
+    def test_decorator(self):
+        @query_budget(0)
+        def no_queries():
+            return 1
+
+        self.assertEqual(no_queries(), 1)
+
+
+@override_settings(
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    PORTAL_CACHE_TIMEOUT=0,
+)
+class ViewQueryBudgetTest(TestCase):
+    """
+    各画面のクエリ数が上限（バジェット）以内であることの検証。
+    データは setup_test_data で投入する。
+    画面 (URL名) を追加した場合は BUDGETS にも追加すること。
+    """
+
+    # URL名: クエリ数の上限
+    BUDGETS = {
+        "portal:index": 9,
+        "approvals:create": 3,
+        "approvals:copy": 6,
+        "approvals:detail": 7,
+        "approvals:action": 12,
+        "approvals:withdraw": 11,
+        "approvals:update": 6,
+        "approvals:proxy-remand": 12,
+        "accounts:login": 0,
+        "accounts:login_sent": 0,
+        "accounts:verify": 11,
+        "accounts:logout": 4,
+        "accounts:approver-autocomplete": 4,
+        "accounts:active-user-autocomplete": 4,
+        "notification:detail": 3,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("setup_test_data", stdout=StringIO())
+        cls.admin = User.objects.get(email="admin@example.com")
+        cls.yamada = User.objects.get(email="yamada@example.com")
+        cls.leader = User.objects.get(email="leader@example.com")
+
+    def setUp(self):
+        cache.clear()
+
+    def request_pk(self, number):
+        return Request.objects.get(request_number=number).pk
+
+    def check(self, name, user=None, method="get", kwargs=None, **extra):
+        """画面を表示し、クエリ数が上限以内であることを検証する"""
+        if user is not None:
+            self.client.force_login(user)
+        url = reverse(name, kwargs=kwargs)
+        with query_budget(self.BUDGETS[name], label=name):
+            response = getattr(self.client, method)(url, **extra)
+        self.assertLess(response.status_code, 400, name)
+
+    def test_every_url_has_a_budget(self):
+        names = set()
+        for namespace in ("portal", "approvals", "accounts", "notification"):
+            resolver = get_resolver().namespace_dict[namespace][1]
+            names.update(
+                f"{namespace}:{pattern.name}"
+                for pattern in resolver.url_patterns
+            )
+        self.assertEqual(names - set(self.BUDGETS), set())
+
+    def test_portal(self):
+        self.check("portal:index")
+        self.check("portal:index", user=self.yamada)
+        self.check("portal:index", data={"q": "申請", "status": "1"})
+
+    def test_request_views(self):
+        pending = self.request_pk("REQ-S-TEST-0002")
+        remanded = self.request_pk("REQ-S-TEST-0006")
+        self.check(
+            "approvals:create",
+            user=self.yamada,
+            kwargs={"request_type": "simple"},
+        )
+        self.check("approvals:copy", kwargs={"pk": pending})
+        self.check("approvals:detail", kwargs={"pk": pending})
+        self.check("approvals:update", kwargs={"pk": remanded})
+        self.check("approvals:withdraw", method="post", kwargs={"pk": pending})
+
+    def test_action_views(self):
+        pending = self.request_pk("REQ-S-TEST-0001")
+        self.check(
+            "approvals:action",
+            user=self.leader,
+            method="post",
+            kwargs={"pk": pending},
+            data={"action": "approve"},
+        )
+        self.check(
+            "approvals:proxy-remand",
+            user=self.admin,
+            method="post",
+            kwargs={"pk": pending},
+            data={"comment": "代理差戻し"},
+        )
+
+    def test_account_views(self):
+        token = LoginToken.create_token(self.yamada)
+        self.check("accounts:login")
+        self.check("accounts:login_sent")
+        self.check("accounts:verify", kwargs={"token": token.token})
+        self.check("accounts:approver-autocomplete", data={"q": "田中"})
+        self.check("accounts:active-user-autocomplete", data={"q": "山田"})
+        self.check("accounts:logout")
+
+    def test_notification_detail(self):
+        notification = Notification.objects.order_by("published_at").last()
+        self.check(
+            "notification:detail",
+            user=self.yamada,
+            kwargs={"pk": notification.pk},
+        )
+
+
+class RequestMetricsMiddlewareTest(TestCase):
+    """
+    リクエストごとの計測ミドルウェアのテスト。
+    """
+
+    @override_settings(REQUEST_METRICS_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get(reverse("portal:index"))
+        header = response["Server-Timing"]
+        self.assertIn("db;dur=", header)
+        self.assertIn("queries", header)
+        self.assertIn("resp;dur=", header)
+        self.assertIn("total;dur=", header)
+
+    def test_server_timing_is_off_by_default(self):
+        """既定ではクエリ数などをクライアントに公開しないこと"""
+        response = self.client.get(reverse("portal:index"))
+        self.assertFalse(response.has_header("Server-Timing"))
+
+    def test_structured_log_line(self):
+        with self.assertLogs("core.metrics", level="INFO") as logs:
+            self.client.get(reverse("portal:index"))
+        record = logs.records[0]
+        self.assertEqual(record.metrics["path"], "/")
+        self.assertEqual(record.metrics["status"], 200)
+        self.assertGreater(record.metrics["queries"], 0)
+        self.assertIn("response_ms", record.metrics)
+
+    @override_settings(REQUEST_METRICS_SLOW_MS=0)
+    def test_slow_request_queries_are_logged(self):
+        with self.assertLogs("core.metrics.slow", level="WARNING") as logs:
+            self.client.get(reverse("portal:index"))
+        data = json.loads(logs.records[0].getMessage())
+        self.assertEqual(len(data["query_list"]), data["queries"])
+        self.assertIn("sql", data["query_list"][0])
+
+    @override_settings(
+        REQUEST_METRICS_ENABLED=False, REQUEST_METRICS_SERVER_TIMING=True
+    )
+    def test_disabled(self):
+        response = self.client.get(reverse("portal:index"))
+        self.assertFalse(response.has_header("Server-Timing"))
@@ -1,6 +1,21 @@
-from django.apps import AppConfig
+from django.apps import AppConfig, apps
+from django.db.models.signals import post_delete, post_save
 
 
 class PortalConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "portal"
+
+    def ready(self):
+        from approvals.models import Approver, Request
+        from notification.models import Notification
+
+        from .cache import bump_data_version
+
+        # ポータルに表示するデータが変わったらキャッシュのバージョンを進める
+        # (申請は子モデルごとに送信されるため、全ての子モデルに接続する)
+        watched = (Request, Approver, Notification)
+        for model in apps.get_models():
+            if issubclass(model, watched):
+                post_save.connect(bump_data_version, sender=model)
+                post_delete.connect(bump_data_version, sender=model)
@@ -0,0 +1,104 @@
+"""
+ポータル画面の部品（お知らせ・承認待ち・差戻し）のキャッシュ。
+
+キャッシュキーにはデータのバージョン番号を含める。
+申請 (Request と子モデル)・承認者 (Approver)・お知らせ (Notification) が
+保存・削除されるたびにバージョン番号を進めるため（PortalConfig.ready で接続）、
+古いキャッシュは参照されなくなり、有効期限 (PORTAL_CACHE_TIMEOUT) で消える。
+QuerySet.update() などシグナルを伴わない更新は有効期限まで反映されない。
+
+バージョン番号は全プロセスで共有する必要があるため、CACHES (default) に
+プロセス間で共有するキャッシュ (Redis・Memcached・データベースなど) を
+設定した場合のみキャッシュする。プロセスごとのキャッシュ (LocMemCache) では
+他のプロセスでの更新が反映されないため、PORTAL_CACHE_TIMEOUT に関わらず
+キャッシュしない。
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "portal:data_version"
+
+# プロセス間で共有されないキャッシュのバックエンド
+LOCAL_CACHE_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+def is_shared_cache() -> bool:
+    """default のキャッシュがプロセス間で共有されるか"""
+    backend = settings.CACHES[DEFAULT_CACHE_ALIAS]["BACKEND"]
+    return backend not in LOCAL_CACHE_BACKENDS
+
+
+def is_enabled() -> bool:
+    """キャッシュする設定か（有効期限が 0 でなく、共有キャッシュである）"""
+    return bool(settings.PORTAL_CACHE_TIMEOUT) and is_shared_cache()
+
+
+def get_data_version() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # キャッシュから消えた後に古い番号を再利用しないよう時刻から始める
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _bump() -> None:
+    try:
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            # 番号がキャッシュから消えている場合は時刻から始め直す
+            get_data_version()
+    except Exception as e:
+        # キャッシュの障害で申請・承認の保存を失敗させない
+        logger.warning(f"Failed to bump the portal data version: {e}")
+
+
+def bump_data_version(sender=None, using=None, **kwargs) -> None:
+    """
+    データのバージョン番号を進める（post_save / post_delete のハンドラ）。
+    トランザクション内の場合は、コミット前の内容がキャッシュされないよう
+    コミット後にもう一度進める。キャッシュが無効な場合は何もしない。
+    """
+    if not is_enabled():
+        return
+    _bump()
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(_bump, using=using)
+
+
+def cached(
+    name: str,
+    parts: tuple,
+    compute: Callable[[], Any],
+    is_valid: Optional[Callable[[Any], bool]] = None,
+) -> Any:
+    """
+    部品の値をキャッシュから返す（なければ compute() の結果を保存して返す）。
+    is_valid が False を返す値（例: 公開予定のお知らせが公開された）は
+    計算し直す。PORTAL_CACHE_TIMEOUT が 0 の場合と、
+    キャッシュがプロセス間で共有されない場合はキャッシュしない。
+    """
+    if not is_enabled():
+        return compute()
+
+    key_parts = [str(part) for part in parts]
+    key = ":".join(["portal", name, str(get_data_version()), *key_parts])
+    value = cache.get(key)
+    if value is None or (is_valid is not None and not is_valid(value)):
+        value = compute()
+        cache.set(key, value, settings.PORTAL_CACHE_TIMEOUT)
+    return value
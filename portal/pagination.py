@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+import uuid
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any, Optional
+
+from django.db import connections
+from django.db.models import F, Q, QuerySet
+
+FORWARD = "n"
+BACKWARD = "p"
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(
+    submitted_at: Optional[datetime], pk: Any, direction: str
+) -> str:
+    """
+    カーソル（ページ境界の行の (submitted_at, id) と方向）を
+    URLに埋め込める不透明な文字列にする。
+    """
+    payload = {
+        "s": submitted_at.isoformat() if submitted_at else None,
+        "i": str(pk),
+        "d": direction,
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[Optional[datetime], uuid.UUID, str]:
+    """
+    カーソル文字列を (submitted_at, id, 方向) に戻す。
+    改ざん・破損している場合は InvalidCursor を送出する。
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        submitted_at = (
+            datetime.fromisoformat(payload["s"]) if payload["s"] else None
+        )
+        pk = uuid.UUID(payload["i"])
+        direction = payload["d"]
+    except (
+        binascii.Error,
+        ValueError,
+        TypeError,
+        KeyError,
+        UnicodeDecodeError,
+    ) as e:
+        raise InvalidCursor(str(e)) from e
+    if direction not in (FORWARD, BACKWARD):
+        raise InvalidCursor(f"Unknown direction: {direction}")
+    return submitted_at, pk, direction
+
+
+class KeysetPage(Sequence):
+    """
+    キーセットページネーションの1ページ分。
+    テンプレートからは Django の Page と同様に反復・真偽判定ができる。
+    """
+
+    is_keyset = True
+
+    def __init__(
+        self,
+        object_list: list[Any],
+        has_next: bool,
+        has_previous: bool,
+        approximate_count: Optional[int] = None,
+        count_is_capped: bool = False,
+    ) -> None:
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.approximate_count = approximate_count
+        self.count_is_capped = count_is_capped
+
+    def __repr__(self) -> str:
+        return f"<KeysetPage ({len(self.object_list)} objects)>"
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def has_previous(self) -> bool:
+        return self._has_previous
+
+    def has_other_pages(self) -> bool:
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self) -> Optional[str]:
+        if not self._has_next or not self.object_list:
+            return None
+        last = self.object_list[-1]
+        return encode_cursor(last.submitted_at, last.pk, FORWARD)
+
+    @property
+    def previous_cursor(self) -> Optional[str]:
+        if not self._has_previous or not self.object_list:
+            return None
+        first = self.object_list[0]
+        return encode_cursor(first.submitted_at, first.pk, BACKWARD)
+
+
+class KeysetPaginator:
+    """
+    (submitted_at 降順・NULLは末尾, id 降順) のキーセットページネーション。
+    OFFSET を使わずインデックス (submitted_at, id) を辿るため、
+    何ページ目でも1ページ目と同じコストで取得できる。
+    総件数の COUNT(*) は行わず、必要に応じて概算件数を返す。
+    """
+
+    # 概算件数を数える上限（PostgreSQL 以外）
+    count_limit = 1000
+
+    def __init__(
+        self,
+        queryset: QuerySet,
+        per_page: int,
+        approximate_count: bool = False,
+    ) -> None:
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.approximate_count = approximate_count
+
+    def get_page(self, cursor: Optional[str]) -> KeysetPage:
+        """
+        カーソルに対応するページを返す。
+        カーソルが未指定または不正な場合は1ページ目を返す。
+        """
+        position = None
+        if cursor:
+            try:
+                position = decode_cursor(cursor)
+            except InvalidCursor:
+                position = None
+
+        if position is None:
+            rows = self._fetch(self.queryset, forward=True)
+            has_next = len(rows) > self.per_page
+            object_list = rows[: self.per_page]
+            has_previous = False
+        else:
+            submitted_at, pk, direction = position
+            forward = direction == FORWARD
+            qs = self.queryset.filter(
+                self._after(submitted_at, pk)
+                if forward
+                else self._before(submitted_at, pk)
+            )
+            rows = self._fetch(qs, forward=forward)
+            has_more = len(rows) > self.per_page
+            rows = rows[: self.per_page]
+            if forward:
+                object_list = rows
+                has_next, has_previous = has_more, True
+            else:
+                object_list = rows[::-1]
+                has_next, has_previous = True, has_more
+
+        count, capped = (None, False)
+        if self.approximate_count:
+            count, capped = self.estimate_count()
+
+        return KeysetPage(object_list, has_next, has_previous, count, capped)
+
+    def _fetch(self, qs: QuerySet, forward: bool) -> list[Any]:
+        """並び順を指定して per_page + 1 件取得する（次ページ有無の判定用）"""
+        if forward:
+            ordering = [F("submitted_at").desc(nulls_last=True), "-id"]
+        else:
+            ordering = [F("submitted_at").asc(nulls_first=True), "id"]
+        return list(qs.order_by(*ordering)[: self.per_page + 1])
+
+    @staticmethod
+    def _after(submitted_at: Optional[datetime], pk: uuid.UUID) -> Q:
+        """並び順で (submitted_at, pk) より後ろの行"""
+        if submitted_at is None:
+            return Q(submitted_at__isnull=True, id__lt=pk)
+        return (
+            Q(submitted_at__lt=submitted_at)
+            | Q(submitted_at=submitted_at, id__lt=pk)
+            | Q(submitted_at__isnull=True)
+        )
+
+    @staticmethod
+    def _before(submitted_at: Optional[datetime], pk: uuid.UUID) -> Q:
+        """並び順で (submitted_at, pk) より前の行"""
+        if submitted_at is None:
+            return Q(submitted_at__isnull=False) | Q(
+                submitted_at__isnull=True, id__gt=pk
+            )
+        return Q(submitted_at__gt=submitted_at) | Q(
+            submitted_at=submitted_at, id__gt=pk
+        )
+
+    def estimate_count(self) -> tuple[int, bool]:
+        """
+        概算件数を返す (件数, 上限で打ち切ったか)。
+        PostgreSQL ではプランナの推定行数を使い、
+        それ以外では count_limit 件までを数える。
+        """
+        qs = self.queryset.order_by()
+        connection = connections[qs.db]
+        if connection.vendor == "postgresql":
+            sql, params = qs.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]["Plan"]["Plan Rows"]), False
+
+        count = qs[: self.count_limit].count()
+        return count, count >= self.count_limit
@@ -1,11 +1,20 @@
 # portal/tests.py
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 
 from approvals.models import Approver, Request
 from approvals.models.types import SimpleRequest
 
+from .pagination import KeysetPaginator
+
 User = get_user_model()
 
 
@@ -28,6 +37,7 @@ class PortalViewTest(TestCase):
             title="自分宛の依頼",
             applicant=self.user,
             status=Request.STATUS_PENDING,
+            current_approver=self.approver,
             request_number="REQ-P1",
         )
         Approver.objects.create(request=req, user=self.approver, order=1)
@@ -97,3 +107,180 @@ class PortalViewTest(TestCase):
         self.client.force_login(self.user)
         response_owner = self.client.get(url)
         self.assertContains(response_owner, "秘密だよ")
+
+
+# プロセス間で共有されるキャッシュの代わりにファイルキャッシュを使う
+SHARED_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(tempfile.gettempdir(), "popon-portal-tests"),
+    }
+}
+
+
+@override_settings(CACHES=SHARED_CACHES, PORTAL_CACHE_TIMEOUT=300)
+class PortalCacheTest(TestCase):
+    """
+    ポータルの部品キャッシュのテスト。
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.applicant = User.objects.create_user(
+            email="pc-app@example.com", is_active=True
+        )
+        self.approver = User.objects.create_user(
+            email="pc-apr@example.com", is_active=True, is_approver=True
+        )
+        self.req = SimpleRequest.objects.create(
+            title="キャッシュ前",
+            applicant=self.applicant,
+            status=Request.STATUS_PENDING,
+            current_approver=self.approver,
+            request_number="REQ-PC1",
+        )
+        self.route = Approver.objects.create(
+            request=self.req, user=self.approver, order=1
+        )
+        self.client.force_login(self.approver)
+        self.url = reverse("portal:index")
+
+    def test_fragments_are_cached_until_data_changes(self):
+        """データが保存されるまではキャッシュした内容を表示すること"""
+        self.client.get(self.url)
+
+        # シグナルを伴わない更新はキャッシュに反映されない
+        SimpleRequest.objects.filter(pk=self.req.pk).update(
+            title="キャッシュ後", status=Request.STATUS_APPROVED
+        )
+        response = self.client.get(self.url)
+        self.assertContains(response, "キャッシュ前")
+
+        # 承認者の保存でバージョンが進み、最新の内容になる
+        self.route.save()
+        response = self.client.get(self.url)
+        self.assertNotContains(response, "キャッシュ前")
+
+    def test_cache_outage_does_not_break_writes(self):
+        """キャッシュの障害時も保存は成功し、警告を記録すること"""
+        with (
+            mock.patch("portal.cache.cache") as broken,
+            self.assertLogs("portal.cache", level="WARNING"),
+        ):
+            broken.incr.side_effect = ConnectionError("cache is down")
+            self.route.save()
+        self.assertTrue(broken.incr.called)
+
+    @override_settings(PORTAL_CACHE_TIMEOUT=0)
+    def test_version_is_not_bumped_when_disabled(self):
+        with mock.patch("portal.cache.cache") as unused:
+            self.route.save()
+        self.assertFalse(unused.incr.called)
+
+    def assert_not_cached(self):
+        self.client.get(self.url)
+        SimpleRequest.objects.filter(pk=self.req.pk).update(
+            title="キャッシュ後", status=Request.STATUS_APPROVED
+        )
+        response = self.client.get(self.url)
+        self.assertNotContains(response, "キャッシュ前")
+
+    @override_settings(PORTAL_CACHE_TIMEOUT=0)
+    def test_cache_can_be_disabled(self):
+        self.assert_not_cached()
+
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+            }
+        }
+    )
+    def test_process_local_cache_is_not_used(self):
+        """プロセスごとのキャッシュでは古い内容を表示しないよう使わないこと"""
+        self.assert_not_cached()
+
+
+class KeysetPaginationTest(TestCase):
+    """
+    キーセット（カーソル）方式のページネーションのテスト。
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="keyset@example.com", is_active=True
+        )
+        now = timezone.now()
+        # 同じ申請日時の行と、申請日時が未設定の行を含める
+        times = [now, now, now - timedelta(hours=1), None, None]
+        for i, submitted_at in enumerate(times):
+            SimpleRequest.objects.create(
+                title=f"keyset {i}",
+                applicant=self.user,
+                request_number=f"REQ-K{i}",
+                submitted_at=submitted_at,
+            )
+
+    def walk(self, paginator):
+        """次ページを最後まで辿り、ページごとの件名リストを返す"""
+        pages = []
+        page = paginator.get_page(None)
+        while True:
+            pages.append([r.title for r in page])
+            if not page.has_next():
+                return pages, page
+            page = paginator.get_page(page.next_cursor)
+
+    def test_forward_and_backward(self):
+        """前後のカーソルで全件を重複・欠落なく辿れること"""
+        qs = Request.objects.all()
+        paginator = KeysetPaginator(qs, 2)
+        pages, last_page = self.walk(paginator)
+
+        titles = [t for page in pages for t in page]
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(sorted(titles), sorted(set(titles)))
+        self.assertEqual(len(titles), 5)
+        # 申請日時未設定の行は末尾に並ぶこと
+        self.assertEqual(set(titles[-2:]), {"keyset 3", "keyset 4"})
+
+        # 最終ページから前へ戻ると同じページ分割になること
+        page = last_page
+        backward = [[r.title for r in page]]
+        while page.has_previous():
+            page = paginator.get_page(page.previous_cursor)
+            backward.append([r.title for r in page])
+        self.assertEqual(backward[::-1], pages)
+
+    def test_invalid_cursor_returns_first_page(self):
+        paginator = KeysetPaginator(Request.objects.all(), 2)
+        page = paginator.get_page("not-a-cursor")
+        self.assertFalse(page.has_previous())
+        self.assertEqual(len(page), 2)
+
+    def test_approximate_count(self):
+        paginator = KeysetPaginator(
+            Request.objects.all(), 2, approximate_count=True
+        )
+        paginator.count_limit = 3
+        page = paginator.get_page(None)
+        self.assertEqual(page.approximate_count, 3)
+        self.assertTrue(page.count_is_capped)
+
+    @override_settings(
+        PORTAL_REQUESTS_PAGINATION="keyset", PORTAL_REQUESTS_PER_PAGE=2
+    )
+    def test_ajax_request_list(self):
+        """Ajaxの申請一覧がカーソル付きのボタンを返すこと"""
+        url = reverse("portal:index")
+        headers = {"x-requested-with": "XMLHttpRequest"}
+        response = self.client.get(url, {"target": "request"}, headers=headers)
+        self.assertContains(response, "data-cursor=")
+        self.assertNotContains(response, "data-page=")
+
+        cursor = response.context["request_list"].next_cursor
+        response = self.client.get(
+            url, {"target": "request", "cursor": cursor}, headers=headers
+        )
+        self.assertTrue(response.context["request_list"].has_previous())
@@ -1,14 +1,17 @@
 from django.conf import settings
-from django.core.paginator import Paginator
-from django.db.models import F, Q
+from django.core.paginator import Page, Paginator
 from django.shortcuts import render
 from django.utils import timezone
 from django.views.generic import TemplateView
 
-from approvals.models import Approver, Request
+from approvals.models import Request
+from approvals.registry import registry
+from approvals.search import search_requests
 from notification.models import Notification
 
+from . import cache
 from .forms import SearchForm
+from .pagination import KeysetPaginator
 
 
 class DashboardView(TemplateView):
@@ -19,32 +22,58 @@ class DashboardView(TemplateView):
     template_name = "portal/index.html"
 
     def get_notifications(self):
-        """お知らせ一覧を取得してページネーション"""
-        qs = Notification.objects.filter(
-            published_at__lte=timezone.now()
-        ).order_by("-published_at")
-
+        """
+        お知らせ一覧を取得してページネーション。
+        ページの内容と総件数は全ユーザー共通でキャッシュする。
+        """
+        now = timezone.now()
+        qs = Notification.objects.filter(published_at__lte=now).order_by(
+            "-published_at"
+        )
         paginator = Paginator(qs, settings.PORTAL_NOTIFICATIONS_PER_PAGE)
-        page_number = self.request.GET.get("n_page")
-        return paginator.get_page(page_number)
+
+        try:
+            page_number = int(self.request.GET.get("n_page") or 1)
+        except ValueError:
+            page_number = 1
+
+        def compute():
+            page = paginator.get_page(page_number)
+            # 公開日時が未来のお知らせが公開されたらキャッシュを使わない
+            next_published_at = (
+                Notification.objects.filter(published_at__gt=now)
+                .order_by("published_at")
+                .values_list("published_at", flat=True)
+                .first()
+            )
+            return (
+                list(page.object_list),
+                page.number,
+                paginator.count,
+                next_published_at,
+            )
+
+        def is_valid(value):
+            next_published_at = value[3]
+            return next_published_at is None or next_published_at > now
+
+        object_list, number, count, _ = cache.cached(
+            "notifications", (page_number,), compute, is_valid
+        )
+
+        # 総件数はキャッシュした値を使う（COUNT クエリを省く）
+        paginator.count = count
+        return Page(object_list, number, paginator)
 
     def get_requests(self, form):
         """申請一覧を取得してページネーション"""
         user = self.request.user
 
-        # ベースのクエリセット作成 (全ての申請 Request を対象)
-        if user.is_authenticated:
-            my_related_ids = Request.objects.filter(
-                Q(applicant=user) | Q(approvers__user=user)
-            ).values_list("id", flat=True)
-
-            qs = Request.objects.filter(
-                Q(is_restricted=False) | Q(id__in=my_related_ids)
-            )
-        else:
-            qs = Request.objects.filter(is_restricted=False)
+        # ベースのクエリセット作成 (全ての申請 Request のうち閲覧可能なもの)
+        qs = Request.objects.visible_to(user)
 
         # 検索フィルタ適用
+        searched = False
         if form.is_valid():
             q = form.cleaned_data.get("q")
             status = form.cleaned_data.get("status")
@@ -52,9 +81,9 @@ class DashboardView(TemplateView):
             own_only = form.cleaned_data.get("own_only")
 
             if q:
-                qs = qs.filter(
-                    Q(title__icontains=q) | Q(request_number__icontains=q)
-                )
+                # 全文検索（申請番号・件名・申請タイプ固有の項目）
+                qs = search_requests(qs, q)
+                searched = True
 
             if status:
                 qs = qs.filter(status=status)
@@ -64,8 +93,22 @@ class DashboardView(TemplateView):
             elif applicant:
                 qs = qs.filter(applicant=applicant)
 
-        # 並び替え
-        qs = qs.select_related("applicant").order_by("-submitted_at")
+        qs = qs.select_related("applicant")
+
+        # キーセット方式: 並び順はページネータ側で (申請日時, id) の降順に固定
+        if settings.PORTAL_REQUESTS_PAGINATION == "keyset":
+            keyset_paginator = KeysetPaginator(
+                qs,
+                settings.PORTAL_REQUESTS_PER_PAGE,
+                approximate_count=settings.PORTAL_REQUESTS_APPROXIMATE_COUNT,
+            )
+            return keyset_paginator.get_page(self.request.GET.get("cursor"))
+
+        # 並び替え (キーワード検索時は適合度順)
+        if searched:
+            qs = qs.order_by("-search_rank", "-submitted_at")
+        else:
+            qs = qs.order_by("-submitted_at")
 
         paginator = Paginator(qs, settings.PORTAL_REQUESTS_PER_PAGE)
         page_number = self.request.GET.get("page")
@@ -105,36 +148,32 @@ class DashboardView(TemplateView):
 
         # 2. 承認依頼（ログイン時のみ）
         if user.is_authenticated:
-            # 承認待ち (Approver と Request で絞り込み)
-            context["pending_approvals"] = (
-                Request.objects.filter(
-                    status=Request.STATUS_PENDING,
-                    approvers__user=user,
-                    approvers__status=Approver.STATUS_PENDING,
-                    approvers__order=F("current_step"),
-                )
-                .select_related("applicant")
-                .distinct()
-                .order_by("submitted_at")
+            # 承認待ち (現在の承認者が自分の申請中案件)
+            context["pending_approvals"] = cache.cached(
+                "pending_approvals",
+                (user.pk,),
+                lambda: list(
+                    Request.objects.filter(
+                        status=Request.STATUS_PENDING, current_approver=user
+                    )
+                    .select_related("applicant")
+                    .order_by("submitted_at")
+                ),
             )
 
             # 差戻し（再申請待ち）
-            context["remanded_requests"] = Request.objects.filter(
-                applicant=user, status=Request.STATUS_REMANDED
-            ).order_by("-updated_at")
+            context["remanded_requests"] = cache.cached(
+                "remanded_requests",
+                (user.pk,),
+                lambda: list(
+                    Request.objects.filter(
+                        applicant=user, status=Request.STATUS_REMANDED
+                    ).order_by("-updated_at")
+                ),
+            )
 
         # 4. 利用可能な申請タイプ一覧 (メニュー用)
-        # テンプレートからはクラス属性(_meta)にアクセスできないため辞書化して渡す
-        available_types = []
-        for cls in Request.get_request_types():
-            available_types.append(
-                {
-                    "slug": cls.get_slug(),
-                    "name": cls._meta.verbose_name,
-                }
-            )
-        # 名前順でソート
-        available_types.sort(key=lambda x: x["name"])
-        context["available_request_types"] = available_types
+        # 起動時にレジストリで名前順に構築済みのものを使う
+        context["available_request_types"] = registry.menu_entries
 
         return context
@@ -36,10 +36,14 @@ document.addEventListener('DOMContentLoaded', function() {
         e.preventDefault();
         const target = btn.dataset.target;
         const page = btn.dataset.page;
+        const cursor = btn.dataset.cursor;
         
         const params = new URLSearchParams(new FormData(searchForm));
         if (target === 'notification') {
             params.set('n_page', page);
+        } else if (cursor) {
+            // キーセット方式（カーソル）のページネーション
+            params.set('cursor', cursor);
         } else {
             params.set('page', page);
         }